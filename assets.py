@@ -0,0 +1,67 @@
+import pygame as pg
+import os
+from atlas import TextureAtlas
+from mipmap import get_mip_chain
+
+# Images are shared between game sessions, so restarting a level never touches the disk.
+# Callers must treat the returned surfaces as read only. The images of a directory are packed in
+# one atlas together with their mip chains and returned as subsurfaces of it.
+cache = {}
+mip_chains = {}
+
+
+def cached(loader):
+    def load(*args):
+        key = loader.__name__, args
+        if key not in cache:
+            cache[key] = loader(*args)
+        return cache[key]
+    return load
+
+
+def pack_with_mips(images):
+    chains = [get_mip_chain(image) for image in images]
+    frames = iter(TextureAtlas([surface for chain in chains for surface in chain]).get_frames())
+    packed = []
+    for chain in chains:
+        mips = tuple(next(frames) for _ in chain)
+        mip_chains[mips[0]] = mips
+        packed.append(mips[0])
+    return packed
+
+
+def get_mips(image):
+    return mip_chains.get(image, (image,))
+
+
+@cached
+def load_image(path):
+    return pack_with_mips([pg.image.load(path).convert_alpha()])[0]
+
+
+def get_file_names(path):
+    return [file_name for file_name in os.listdir(path) if os.path.isfile(os.path.join(path, file_name))]
+
+
+@cached
+def load_images(path):
+    images = [pg.image.load(path + "/" + file_name).convert_alpha() for file_name in get_file_names(path)]
+    return tuple(pack_with_mips(images))
+
+
+@cached
+def load_scaled_images(path, size):
+    # the full size sources are not cached, only the scaled copies are kept
+    images = [pg.transform.smoothscale(pg.image.load(path + "/" + file_name).convert_alpha(), size)
+              for file_name in get_file_names(path)]
+    return tuple(TextureAtlas(images).get_frames())
+
+
+def get_cached_surfaces():
+    surfaces = {}
+    for value in cache.values():
+        for surface in value if isinstance(value, tuple) else (value,):
+            if surface.get_parent() is not None:
+                surface = surface.get_parent()
+            surfaces[id(surface)] = surface
+    return list(surfaces.values())
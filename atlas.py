@@ -0,0 +1,31 @@
+import pygame as pg
+from settings import *
+
+
+class TextureAtlas:
+    def __init__(self, surfaces, width=ATLAS_WIDTH):
+        width = max([width] + [surface.get_width() for surface in surfaces])
+        self.rects = self.pack(surfaces, width)
+        size = max((rect.right for rect in self.rects), default=1), max((rect.bottom for rect in self.rects), default=1)
+        self.surface = pg.Surface(size, pg.SRCALPHA).convert_alpha()
+        for surface, rect in zip(surfaces, self.rects):
+            # the atlas starts fully transparent, MAX copies the pixels and their alpha unchanged
+            self.surface.blit(surface, rect, special_flags=pg.BLEND_RGBA_MAX)
+
+    @staticmethod
+    def pack(surfaces, width):
+        # shelf packing, tallest images first so every shelf wastes little height
+        rects = [None] * len(surfaces)
+        x, y, shelf_height = 0, 0, 0
+        for i in sorted(range(len(surfaces)), key=lambda i: -surfaces[i].get_height()):
+            w, h = surfaces[i].get_size()
+            if x + w > width:
+                x, y, shelf_height = 0, y + shelf_height, 0
+            rects[i] = pg.Rect(x, y, w, h)
+            x += w
+            shelf_height = max(shelf_height, h)
+        return rects
+
+    def get_frames(self):
+        # frames are views into the atlas and share its pixels
+        return [self.surface.subsurface(rect) for rect in self.rects]
@@ -0,0 +1,261 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+from main import *
+from npc import *
+from levelgen import generate_level, get_reachable
+import random
+
+# Micro-benchmarks of the hot paths on procedural levels. Every sample is the mean time of
+# BENCH_NUMBER calls and every case takes BENCH_REPEAT samples. `run --save` stores the samples
+# as a baseline; `compare` runs the same cases again and flags the slowdowns that a one sided
+# Welch t-test finds significant.
+
+BENCH_REPEAT = 20
+BENCH_NUMBER = 5
+BENCH_QUERIES = 20
+BENCH_ALPHA = 0.01
+BENCH_MIN_CHANGE = 0.05
+
+
+def bench_ray_cast(game, rng):
+    return game.raycasting.ray_cast
+
+
+def bench_get_objects_to_render(game, rng):
+    game.raycasting.ray_cast()
+    return game.raycasting.get_objects_to_render
+
+
+def bench_get_path(game, rng):
+    # cold queries across the map, the waypoint cache is emptied before every run
+    tiles = sorted(get_reachable(game.map.mini_map, PLAYER_POS))
+    queries = [(rng.choice(tiles), rng.choice(tiles)) for _ in range(BENCH_QUERIES)]
+    pathfinding = game.pathfinding
+
+    def run():
+        pathfinding.path_cache.clear()
+        for start, goal in queries:
+            pathfinding.get_path(start, goal)
+    return run
+
+
+def bench_next_step(game, rng):
+    # the breadth first search NPCs run inside their own and the neighbouring cluster
+    tiles = sorted(get_reachable(game.map.mini_map, PLAYER_POS))
+    pathfinding = game.pathfinding
+    queries = []
+    for _ in range(BENCH_QUERIES):
+        start = rng.choice(tiles)
+        bounds = pathfinding.get_bounds(pathfinding.get_cluster(start))
+        goal = rng.choice([(x, y) for x, y in tiles if bounds[0] <= x < bounds[2] and bounds[1] <= y < bounds[3]])
+        queries.append((start, goal, bounds))
+
+    def run():
+        for start, goal, bounds in queries:
+            pathfinding.next_step(start, goal, bounds)
+    return run
+
+
+def bench_ray_cast_player_npc(game, rng):
+    npcs = game.object_handler.npc_list
+    for npc in npcs:
+        npc.get_sprite()
+
+    def run():
+        for npc in npcs:
+            npc.ray_cast_player_npc()
+    return run
+
+
+def bench_get_sprite(game, rng):
+    sprites = game.object_handler.sprite_list + game.object_handler.npc_list
+
+    def run():
+        game.raycasting.objects_to_render = []
+        for sprite in sprites:
+            sprite.get_sprite()
+    return run
+
+
+def bench_render_game_objects(game, rng):
+    game.raycasting.update()
+    for sprite in game.object_handler.sprite_list + game.object_handler.npc_list:
+        sprite.get_sprite()
+    renderer = game.object_renderer
+
+    def run():
+        renderer.render_game_objects()
+        renderer.draw_queue.flush()
+    return run
+
+
+BENCHMARKS = {
+    'ray_cast': bench_ray_cast,
+    'get_objects_to_render': bench_get_objects_to_render,
+    'get_path': bench_get_path,
+    'next_step': bench_next_step,
+    'ray_cast_player_npc': bench_ray_cast_player_npc,
+    'get_sprite': bench_get_sprite,
+    'render_game_objects': bench_render_game_objects,
+}
+
+
+def make_game(size, density, npcs, seed):
+    mini_map, doors, npc_positions = generate_level(size, density, npcs, seed)
+    game = Game(mini_map, doors)
+    # every room is reachable with the doors open
+    for door in doors:
+        game.map.open(door)
+    for pos in npc_positions:
+        game.object_handler.add_npc(SoldierNPC(game, pos=pos))
+    game.object_handler.npc_positions = {npc.map_pos for npc in game.object_handler.npc_list}
+    # looking into the map from the spawn corner
+    game.player.angle = math.pi / 4
+    return game
+
+
+def measure(run, repeat=BENCH_REPEAT, number=BENCH_NUMBER):
+    run()
+    samples = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                run()
+            samples.append((time.perf_counter() - start) / number * 1000)
+    finally:
+        gc.enable()
+    return samples
+
+
+def run_benchmarks(config):
+    results = {}
+    for size in config['sizes']:
+        for npcs in config['npcs']:
+            game = make_game(size, config['density'], npcs, config['seed'])
+            for name in config['benchmarks']:
+                run = BENCHMARKS[name](game, random.Random(config['seed']))
+                key = f'{name} size={size} npcs={npcs}'
+                results[key] = measure(run, config['repeat'], config['number'])
+                print(f'{key:<48}{statistics.fmean(results[key]):10.3f} ms  ±{statistics.stdev(results[key]):.3f}')
+    return results
+
+
+def get_environment():
+    return {
+        'python': platform.python_version(),
+        'pygame': pg.version.ver,
+        'kernels': get_kernels().name,
+        'machine': platform.machine(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def betacf(a, b, x):
+    # continued fraction of the incomplete beta function, modified Lentz's method
+    tiny = 1e-30
+    c, d = 1.0, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1) < 1e-12:
+            break
+    return h
+
+
+def betainc(a, b, x):
+    # regularized incomplete beta function I_x(a, b)
+    if x <= 0 or x >= 1:
+        return max(0.0, min(1.0, x))
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x))
+    if x < (a + 1) / (a + b + 2):
+        return front * betacf(a, b, x) / a
+    return 1 - front * betacf(b, a, 1 - x) / b
+
+
+def welch_t_test(baseline, current):
+    # one sided p-value of the current samples being slower than the baseline
+    mean_a, mean_b = statistics.fmean(baseline), statistics.fmean(current)
+    var_a, var_b = statistics.variance(baseline) / len(baseline), statistics.variance(current) / len(current)
+    if var_a + var_b == 0:
+        return 0.0 if mean_b > mean_a else 1.0
+    t = (mean_b - mean_a) / math.sqrt(var_a + var_b)
+    df = (var_a + var_b) ** 2 / (var_a ** 2 / (len(baseline) - 1) + var_b ** 2 / (len(current) - 1))
+    tail = 0.5 * betainc(df / 2, 0.5, df / (df + t * t))
+    return tail if t > 0 else 1 - tail
+
+
+def compare(baseline, current, alpha=BENCH_ALPHA, min_change=BENCH_MIN_CHANGE):
+    regressions = []
+    print(f"{'benchmark':<48}{'baseline':>11}{'current':>11}{'change':>9}{'p':>9}")
+    for key, samples in current.items():
+        if key not in baseline:
+            continue
+        before, after = statistics.fmean(baseline[key]), statistics.fmean(samples)
+        change = after / before - 1
+        p_slower, p_faster = welch_t_test(baseline[key], samples), welch_t_test(samples, baseline[key])
+        flag = ''
+        if p_slower < alpha and change > min_change:
+            flag = 'REGRESSION'
+            regressions.append(key)
+        elif p_faster < alpha and change < -min_change:
+            flag = 'faster'
+        print(f'{key:<48}{before:9.3f}ms{after:9.3f}ms{change:+9.1%}{min(p_slower, p_faster):9.4f}  {flag}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Micro-benchmarks of the game hot paths on procedural levels')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=[16, 64, 256])
+    run_parser.add_argument('--npcs', type=int, nargs='+', default=[8, 64])
+    run_parser.add_argument('--density', type=float, default=0.08)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--repeat', type=int, default=BENCH_REPEAT)
+    run_parser.add_argument('--number', type=int, default=BENCH_NUMBER)
+    run_parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    run_parser.add_argument('--save', help='write the samples to this baseline file')
+    compare_parser = commands.add_parser('compare', help='run the cases of a baseline again and compare')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('--current', help='compare with a saved file instead of running again')
+    compare_parser.add_argument('--alpha', type=float, default=BENCH_ALPHA)
+    compare_parser.add_argument('--min-change', type=float, default=BENCH_MIN_CHANGE)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        config = {'sizes': args.sizes, 'npcs': args.npcs, 'density': args.density, 'seed': args.seed,
+                  'repeat': args.repeat, 'number': args.number, 'benchmarks': args.only}
+        results = run_benchmarks(config)
+        if args.save:
+            with open(args.save, 'w') as file:
+                json.dump({'environment': get_environment(), 'config': config, 'results': results}, file, indent=1)
+    else:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if args.current:
+            with open(args.current) as file:
+                current = json.load(file)['results']
+        else:
+            current = run_benchmarks(baseline['config'])
+        print(f"baseline from {baseline['environment']['date']}, kernels {baseline['environment']['kernels']}")
+        regressions = compare(baseline['results'], current, args.alpha, args.min_change)
+        print(f'{len(regressions)} significant regressions')
+        sys.exit(1 if regressions else 0)
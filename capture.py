@@ -0,0 +1,122 @@
+import pygame as pg
+import numpy as np
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from settings import *
+
+# Gameplay recording. The main loop only copies the finished frame into one of CAPTURE_BUFFERS
+# preallocated surfaces; a writer thread encodes and saves them. When every buffer is still
+# waiting to be written the frame is dropped instead of stalling the game. The writer only uses
+# calls that release the GIL for the heavy work (numpy copies, zlib, file writes) so it does not
+# stall the main loop either.
+
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def encode_png(surface):
+    width, height = surface.get_size()
+    pixels = pg.surfarray.pixels3d(surface)
+    # every row starts with its filter type, 0 for none
+    rows = np.zeros((height, 1 + width * 3), dtype=np.uint8)
+    rows[:, 1:] = pixels.transpose(1, 0, 2).reshape(height, width * 3)
+    del pixels
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header)
+            + png_chunk(b'IDAT', zlib.compress(rows, 1)) + png_chunk(b'IEND', b''))
+
+
+def get_pixel_format(surface):
+    # ffmpeg name of the byte order of the surface pixels, e.g. bgr0 or rgba
+    channels = {shift: name for name, shift, mask in zip('rgba', surface.get_shifts(), surface.get_masks()) if mask}
+    return ''.join(channels.get(8 * byte, '0') for byte in range(surface.get_bytesize()))
+
+
+class FrameCapture:
+    def __init__(self, game, path=CAPTURE_PATH, format=CAPTURE_FORMAT, buffers=CAPTURE_BUFFERS):
+        self.game = game
+        self.path = self.make_folder(path)
+        self.format = format
+        self.size = game.screen.get_size()
+        self.buffers = [game.screen.copy() for _ in range(buffers)]
+        self.free = queue.Queue()
+        self.filled = queue.Queue()
+        for index in range(buffers):
+            self.free.put(index)
+        self.thread = None
+        self.frame = 0
+        self.written = 0
+        self.dropped = 0
+        self.capture_time = 0
+        self.max_capture_time = 0
+
+    @staticmethod
+    def make_folder(path):
+        # captures started within the same second get a counter so they never share a folder
+        name = os.path.join(path, time.strftime('%Y%m%d-%H%M%S'))
+        folder, counter = name, 1
+        while True:
+            try:
+                os.makedirs(folder)
+                return folder
+            except FileExistsError:
+                counter += 1
+                folder = f'{name}-{counter}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.write_frames, daemon=True)
+        self.thread.start()
+
+    def capture(self):
+        start = time.perf_counter()
+        self.frame += 1
+        try:
+            index = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+        else:
+            self.buffers[index].blit(self.game.screen, (0, 0))
+            self.filled.put((self.frame, index))
+        elapsed = time.perf_counter() - start
+        self.capture_time += elapsed
+        self.max_capture_time = max(self.max_capture_time, elapsed)
+
+    def write_frames(self):
+        stream = open(os.path.join(self.path, 'capture.raw'), 'wb') if self.format == 'raw' else None
+        while True:
+            item = self.filled.get()
+            if item is None:
+                break
+            frame, index = item
+            if stream:
+                stream.write(self.buffers[index].get_buffer())
+            else:
+                with open(os.path.join(self.path, f'{frame:06d}.png'), 'wb') as file:
+                    file.write(encode_png(self.buffers[index]))
+            self.written += 1
+            self.free.put(index)
+        if stream:
+            stream.close()
+
+    def stop(self):
+        if self.thread:
+            self.filled.put(None)
+            self.thread.join()
+            self.thread = None
+            self.report()
+
+    def report(self):
+        frames = max(self.frame, 1)
+        print(f'captured {self.written} of {self.frame} frames to {self.path}, {self.dropped} dropped')
+        print(f'capture overhead {self.capture_time / frames * 1000:.3f} ms per frame, '
+              f'{self.max_capture_time * 1000:.3f} ms max')
+        if self.format == 'raw':
+            width, height = self.size
+            print(f'dropped frames are missing from the stream, encode with: ffmpeg -f rawvideo '
+                  f'-pixel_format {get_pixel_format(self.buffers[0])} -video_size {width}x{height} '
+                  f'-framerate {FPS} -i {os.path.join(self.path, "capture.raw")} capture.mp4')
@@ -0,0 +1,12 @@
+class DrawQueue:
+    # gathers the blits of a frame and submits them with a single Surface.blits call
+    def __init__(self, target):
+        self.target = target
+        self.items = []
+
+    def add(self, surface, pos, area=None):
+        self.items.append((surface, pos, area) if area else (surface, pos))
+
+    def flush(self):
+        self.target.blits(self.items, doreturn=False)
+        self.items = []
@@ -0,0 +1,90 @@
+import pygame as pg
+import numpy as np
+from settings import *
+
+
+class FloorCasting:
+    def __init__(self, game, lighting):
+        self.game = game
+        self.lighting = lighting
+        self.screen = game.screen
+        self.width, self.height = WIDTH // RENDER_SCALE, HEIGHT // RENDER_SCALE
+        self.surface = pg.Surface((self.width, self.height)).convert()
+        # mapped pixels in the surface format, so each texel fetch is a single take
+        self.framebuffer = np.zeros((self.width, self.height), dtype=np.uint32)
+        self.map_height, self.map_width = len(game.map.floor_map), len(game.map.floor_map[0])
+        floor_ids = np.array(game.map.floor_map, dtype=np.intp).reshape(-1)
+        ceiling_ids = np.array(game.map.ceiling_map, dtype=np.intp).reshape(-1)
+        # only the textures the map uses are loaded, tile ids become slots of the texture array
+        texture_ids, slots = np.unique(np.concatenate((floor_ids, ceiling_ids)), return_inverse=True)
+        self.textures = self.load_floor_textures(texture_ids)
+        self.floor_ids, self.ceiling_ids = np.split(slots.astype(np.intp), [floor_ids.size])
+        self.lights = np.array(game.map.light_map, dtype=np.intp).reshape(-1)
+
+        # rows of the lower half of the framebuffer; the upper half mirrors them for the ceiling
+        self.num_rows = self.height - self.height // 2
+        rows = np.arange(self.height // 2, self.height) + 0.5
+        row_offset = np.abs(rows * HEIGHT / self.height - HALF_HEIGHT)
+        # a floor point at perpendicular depth d projects 0.5 * SCREEN_DIST / d below the horizon
+        self.row_depth = np.minimum(0.5 * SCREEN_DIST / np.maximum(row_offset, 1e-6), MAX_DEPTH).astype(np.float32)
+        # light level of a pixel is level_table[tile light * num_rows + row]
+        self.level_table = lighting.get_level_table(self.row_depth).reshape(-1)
+        self.row_index = np.arange(self.num_rows, dtype=np.intp)
+
+        # same linear angle step per column as RayCasting, with the fishbowl correction undone
+        columns = (np.arange(self.width) + 0.5) * WIDTH / self.width
+        self.column_angle = -HALF_FOV + columns / WIDTH * FOV
+        self.column_inv_cos = (1 / np.cos(self.column_angle)).astype(np.float32)
+
+    def load_floor_textures(self, texture_ids):
+        # every texture is stored pre-darkened once per light level
+        textures = np.zeros((len(texture_ids), LIGHT_LEVELS, FLOOR_TEXTURE_SIZE, FLOOR_TEXTURE_SIZE), dtype=np.uint32)
+        for slot, texture_id in enumerate(texture_ids):
+            path = self.game.map.floor_textures[texture_id]
+            texture = pg.transform.smoothscale(pg.image.load(path).convert(), (FLOOR_TEXTURE_SIZE,) * 2)
+            for level, shaded in enumerate(self.lighting.get_shaded_levels(texture)):
+                textures[slot, level] = pg.surfarray.array2d(shaded.convert(self.surface))
+        return textures.reshape(-1)
+
+    def cast(self):
+        player = self.game.player
+        angles = player.angle + self.column_angle
+        dir_x = (np.cos(angles) * self.column_inv_cos).astype(np.float32)
+        dir_y = (np.sin(angles) * self.column_inv_cos).astype(np.float32)
+
+        # world coordinates of every floor pixel, shape (columns, rows), in texels
+        world_x = np.multiply.outer(dir_x, self.row_depth)
+        world_x += player.x
+        world_x *= FLOOR_TEXTURE_SIZE
+        world_y = np.multiply.outer(dir_y, self.row_depth)
+        world_y += player.y
+        world_y *= FLOOR_TEXTURE_SIZE
+        texel_x = world_x.astype(np.intp)
+        texel_y = world_y.astype(np.intp)
+
+        tile_x = texel_x // FLOOR_TEXTURE_SIZE
+        tile_y = texel_y // FLOOR_TEXTURE_SIZE
+        np.clip(tile_x, 0, self.map_width - 1, out=tile_x)
+        np.clip(tile_y, 0, self.map_height - 1, out=tile_y)
+        tile = tile_y * self.map_width + tile_x
+
+        texel = texel_x & (FLOOR_TEXTURE_SIZE - 1)
+        texel *= FLOOR_TEXTURE_SIZE
+        texel += texel_y & (FLOOR_TEXTURE_SIZE - 1)
+
+        level = self.lights.take(tile)
+        level *= self.num_rows
+        level += self.row_index
+        level = self.level_table.take(level)
+        texel += level * (FLOOR_TEXTURE_SIZE * FLOOR_TEXTURE_SIZE)
+
+        texture_area = LIGHT_LEVELS * FLOOR_TEXTURE_SIZE * FLOOR_TEXTURE_SIZE
+        floor = self.textures.take(self.floor_ids.take(tile) * texture_area + texel)
+        ceiling = self.textures.take(self.ceiling_ids.take(tile) * texture_area + texel)
+        self.framebuffer[:, :self.num_rows] = ceiling[:, ::-1]
+        self.framebuffer[:, self.height // 2:] = floor
+
+    def draw(self):
+        self.cast()
+        pg.surfarray.blit_array(self.surface, self.framebuffer)
+        pg.transform.scale(self.surface, RES, self.screen)
@@ -0,0 +1,473 @@
+import math
+import random
+import sys
+import numpy as np
+from settings import *
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Numeric hot loops of the game as plain functions over the tile grid. The same source runs as
+# the pure Python reference (grid and buffers are lists) or compiled by numba (numpy arrays), so
+# the kernels only use what both understand: indexing as a[i][j], scalars and preallocated buffers.
+
+WAYS_X = -1, 0, 1, 0, -1, 1, 1, -1
+WAYS_Y = 0, -1, 0, 1, -1, -1, 1, 1
+
+
+def cast_rays(grid, x, y, angle, num_rays, max_depth, half_fov, delta_angle, screen_dist, out, transparent):
+    # out[n] = ray, depth, proj_height, texture, offset, tile_x, tile_y; returns the number of rows
+    # or -1 if out is too small. transparent is scratch space for 2 * max_depth see-through walls.
+    height, width = len(grid), len(grid[0])
+    x_map, y_map = int(x), int(y)
+    # Las texturas se conservan de un rayo al siguiente si un rayo no choca con ninguna pared
+    texture_vert, texture_hor = 1, 1
+    ray_angle = angle - half_fov + 0.0001
+    n = 0
+
+    for ray in range(num_rays):
+        sin_a = math.sin(ray_angle)
+        cos_a = math.cos(ray_angle)
+        num_transparent = 0
+
+        # Intersecciones con las divisiones horizontales del mapa
+        if sin_a > 0:
+            y_hor, dy = y_map + 1.0, 1
+        else:
+            y_hor, dy = y_map - 1e-6, -1
+        depth_hor = (y_hor - y) / sin_a
+        x_hor = x + depth_hor * cos_a
+        delta_depth = dy / sin_a
+        dx = delta_depth * cos_a
+
+        tile_hor_x, tile_hor_y = x_map, y_map
+        for _ in range(max_depth):
+            tile_hor_x, tile_hor_y = int(x_hor), int(y_hor)
+            if 0 <= tile_hor_x < width and 0 <= tile_hor_y < height and grid[tile_hor_y][tile_hor_x]:
+                texture_hor = grid[tile_hor_y][tile_hor_x]
+                # las paredes transparentes (5) se guardan y el rayo sigue avanzando
+                if texture_hor != 5:
+                    break
+                wall = transparent[num_transparent]
+                wall[0], wall[1], wall[2], wall[3] = x_hor, y_hor, depth_hor, texture_hor
+                wall[4], wall[5], wall[6] = 0, tile_hor_x, tile_hor_y
+                num_transparent += 1
+            x_hor += dx
+            y_hor += dy
+            depth_hor += delta_depth
+
+        # Intersecciones con las divisiones verticales
+        if cos_a > 0:
+            x_vert, dx = x_map + 1.0, 1
+        else:
+            x_vert, dx = x_map - 1e-6, -1
+        depth_vert = (x_vert - x) / cos_a
+        y_vert = y + depth_vert * sin_a
+        delta_depth = dx / cos_a
+        dy = delta_depth * sin_a
+
+        tile_vert_x, tile_vert_y = x_map, y_map
+        for _ in range(max_depth):
+            tile_vert_x, tile_vert_y = int(x_vert), int(y_vert)
+            if 0 <= tile_vert_x < width and 0 <= tile_vert_y < height and grid[tile_vert_y][tile_vert_x]:
+                texture_vert = grid[tile_vert_y][tile_vert_x]
+                if texture_vert != 5:
+                    break
+                # si la casilla ya tiene una interseccion horizontal nos quedamos con la mas cercana
+                k = 0
+                while k < num_transparent and not (transparent[k][5] == tile_vert_x and transparent[k][6] == tile_vert_y):
+                    k += 1
+                if k == num_transparent or depth_vert < transparent[k][2]:
+                    wall = transparent[k]
+                    wall[0], wall[1], wall[2], wall[3] = x_vert, y_vert, depth_vert, texture_vert
+                    wall[4], wall[5], wall[6] = 1, tile_vert_x, tile_vert_y
+                    if k == num_transparent:
+                        num_transparent += 1
+            x_vert += dx
+            y_vert += dy
+            depth_vert += delta_depth
+
+        if n + 1 + num_transparent > len(out):
+            return -1
+
+        # La interseccion mas cercana es la pared que se ve, con la distancia corregida del efecto fishbowl
+        if depth_vert < depth_hor:
+            depth, texture, tile_x, tile_y = depth_vert, texture_vert, tile_vert_x, tile_vert_y
+            offset = y_vert % 1 if cos_a > 0 else 1 - y_vert % 1
+        else:
+            depth, texture, tile_x, tile_y = depth_hor, texture_hor, tile_hor_x, tile_hor_y
+            offset = 1 - x_hor % 1 if sin_a > 0 else x_hor % 1
+        depth *= math.cos(angle - ray_angle)
+        row = out[n]
+        row[0], row[1], row[2], row[3] = ray, depth, screen_dist / (depth + 0.0001), texture
+        row[4], row[5], row[6] = offset, tile_x, tile_y
+        n += 1
+
+        for k in range(num_transparent):
+            wall = transparent[k]
+            depth = wall[2] * math.cos(angle - ray_angle)
+            if wall[4]:
+                offset = wall[1] % 1 if cos_a > 0 else 1 - wall[1] % 1
+            else:
+                offset = 1 - wall[0] % 1 if sin_a > 0 else wall[0] % 1
+            row = out[n]
+            row[0], row[1], row[2], row[3] = ray, depth, screen_dist / (depth + 0.0001), wall[3]
+            row[4], row[5], row[6] = offset, wall[5], wall[6]
+            n += 1
+
+        ray_angle += delta_angle
+    return n
+
+
+def line_of_sight(grid, x, y, target_x, target_y, angle, max_depth):
+    # casts one ray from (x, y) and tells if it reaches the target tile before any wall
+    height, width = len(grid), len(grid[0])
+    x_map, y_map = int(x), int(y)
+    if x_map == target_x and y_map == target_y:
+        return True
+
+    wall_dist_v, wall_dist_h = 0.0, 0.0
+    target_dist_v, target_dist_h = 0.0, 0.0
+    sin_a = math.sin(angle)
+    cos_a = math.cos(angle)
+
+    # horizontals
+    if sin_a > 0:
+        y_hor, dy = y_map + 1.0, 1
+    else:
+        y_hor, dy = y_map - 1e-6, -1
+    depth_hor = (y_hor - y) / sin_a
+    x_hor = x + depth_hor * cos_a
+    delta_depth = dy / sin_a
+    dx = delta_depth * cos_a
+
+    for _ in range(max_depth):
+        tile_x, tile_y = int(x_hor), int(y_hor)
+        if tile_x == target_x and tile_y == target_y:
+            target_dist_h = depth_hor
+            break
+        if 0 <= tile_x < width and 0 <= tile_y < height and grid[tile_y][tile_x]:
+            wall_dist_h = depth_hor
+            break
+        x_hor += dx
+        y_hor += dy
+        depth_hor += delta_depth
+
+    # verticals
+    if cos_a > 0:
+        x_vert, dx = x_map + 1.0, 1
+    else:
+        x_vert, dx = x_map - 1e-6, -1
+    depth_vert = (x_vert - x) / cos_a
+    y_vert = y + depth_vert * sin_a
+    delta_depth = dx / cos_a
+    dy = delta_depth * sin_a
+
+    for _ in range(max_depth):
+        tile_x, tile_y = int(x_vert), int(y_vert)
+        if tile_x == target_x and tile_y == target_y:
+            target_dist_v = depth_vert
+            break
+        if 0 <= tile_x < width and 0 <= tile_y < height and grid[tile_y][tile_x]:
+            wall_dist_v = depth_vert
+            break
+        x_vert += dx
+        y_vert += dy
+        depth_vert += delta_depth
+
+    target_dist = max(target_dist_v, target_dist_h)
+    wall_dist = max(wall_dist_v, wall_dist_h)
+    return 0 < target_dist < wall_dist or not wall_dist
+
+
+def bfs_step(grid, start_x, start_y, goal_x, goal_y, x0, y0, x1, y1, blocked, parents, queue):
+    # breadth first search inside the bounds x0 <= x < x1, y0 <= y < y1 avoiding the blocked
+    # tiles (flat x, y pairs); returns the first step from start towards goal or (-1, -1).
+    # parents[i] is the tile that reached tile i, -1 while unvisited and -2 when blocked.
+    width = x1 - x0
+    for i in range(width * (y1 - y0)):
+        parents[i] = -1
+    for i in range(0, len(blocked), 2):
+        if x0 <= blocked[i] < x1 and y0 <= blocked[i + 1] < y1:
+            parents[(blocked[i + 1] - y0) * width + blocked[i] - x0] = -2
+    if not (x0 <= goal_x < x1 and y0 <= goal_y < y1):
+        return -1, -1
+
+    start = (start_y - y0) * width + start_x - x0
+    goal = (goal_y - y0) * width + goal_x - x0
+    parents[start] = start
+    queue[0] = start
+    head, tail = 0, 1
+    while head < tail:
+        node = queue[head]
+        head += 1
+        if node == goal:
+            break
+        node_x, node_y = x0 + node % width, y0 + node // width
+        for k in range(8):
+            next_x, next_y = node_x + WAYS_X[k], node_y + WAYS_Y[k]
+            if x0 <= next_x < x1 and y0 <= next_y < y1 and not grid[next_y][next_x]:
+                next_node = (next_y - y0) * width + next_x - x0
+                if parents[next_node] == -1:
+                    parents[next_node] = node
+                    queue[tail] = next_node
+                    tail += 1
+
+    if parents[goal] < 0:
+        return -1, -1
+    step = goal
+    while parents[step] != start:
+        step = parents[step]
+    return x0 + step % width, y0 + step // width
+
+
+def cluster_distances(grid, x0, y0, x1, y1, sources, targets, out, distances, queue):
+    # breadth first step counts inside the bounds from every source to every target tile (flat
+    # x, y pairs); out[i * number of targets + j] is the distance from source i to target j, -1
+    # when it is unreachable. distances and queue are scratch space of the bounds area.
+    width = x1 - x0
+    num_targets = len(targets) // 2
+    for i in range(len(sources) // 2):
+        for k in range(width * (y1 - y0)):
+            distances[k] = -1
+        start = (sources[2 * i + 1] - y0) * width + sources[2 * i] - x0
+        distances[start] = 0
+        queue[0] = start
+        head, tail = 0, 1
+        while head < tail:
+            node = queue[head]
+            head += 1
+            node_x, node_y = x0 + node % width, y0 + node // width
+            for k in range(8):
+                next_x, next_y = node_x + WAYS_X[k], node_y + WAYS_Y[k]
+                if x0 <= next_x < x1 and y0 <= next_y < y1 and not grid[next_y][next_x]:
+                    next_node = (next_y - y0) * width + next_x - x0
+                    if distances[next_node] == -1:
+                        distances[next_node] = distances[node] + 1
+                        queue[tail] = next_node
+                        tail += 1
+        for j in range(num_targets):
+            out[i * num_targets + j] = distances[(targets[2 * j + 1] - y0) * width + targets[2 * j] - x0]
+
+
+def project_sprite(dx, dy, angle, delta_angle, half_num_rays, scale):
+    # angle, screen column, distance and perpendicular distance of a sprite at (dx, dy) from the player
+    theta = math.atan2(dy, dx)
+    delta = theta - angle
+    if (dx > 0 and angle > math.pi) or (dx < 0 and dy < 0):
+        delta += math.tau
+    screen_x = (half_num_rays + delta / delta_angle) * scale
+    dist = math.hypot(dx, dy)
+    return theta, screen_x, dist, dist * math.cos(delta)
+
+
+KERNELS = cast_rays, line_of_sight, bfs_step, cluster_distances, project_sprite
+
+SIGNATURES = {
+    'cast_rays': 'int64(int64[:, ::1], float64, float64, float64, int64, int64, float64, float64, float64, '
+                 'float64[:, ::1], float64[:, ::1])',
+    'line_of_sight': 'boolean(int64[:, ::1], float64, float64, int64, int64, float64, int64)',
+    'bfs_step': 'UniTuple(int64, 2)(int64[:, ::1], int64, int64, int64, int64, int64, int64, int64, int64, '
+                'int64[::1], int64[::1], int64[::1])',
+    'cluster_distances': 'void(int64[:, ::1], int64, int64, int64, int64, int64[::1], int64[::1], int64[::1], '
+                         'int64[::1], int64[::1])',
+    'project_sprite': 'UniTuple(float64, 4)(float64, float64, float64, float64, float64, float64)',
+}
+
+
+class PythonKernels:
+    name = 'python'
+
+    def __init__(self):
+        self.kernels = self.get_kernels()
+        self.grid = self.get_grid([[0]])
+        self.out = self.get_buffer((2 * NUM_RAYS, 7))
+        self.transparent = self.get_buffer((2 * MAX_DEPTH, 7))
+        self.parents = self.queue = None
+        self.set_search_size(4 * CLUSTER_SIZE * CLUSTER_SIZE)
+
+    def get_kernels(self):
+        return {kernel.__name__: kernel for kernel in KERNELS}
+
+    def get_grid(self, rows):
+        width = max(len(row) for row in rows)
+        return [[int(value) for value in row] + [0] * (width - len(row)) for row in rows]
+
+    def get_buffer(self, shape):
+        if len(shape) == 1:
+            return [0] * shape[0]
+        return [[0.0] * shape[1] for _ in range(shape[0])]
+
+    def get_coords(self, positions):
+        return [value for pos in positions for value in pos]
+
+    def get_rows(self, n):
+        return self.out[:n]
+
+    def set_map(self, mini_map):
+        self.grid = self.get_grid(mini_map)
+
+    def set_tiles(self, changes):
+        for (x, y), value in changes.items():
+            self.grid[y][x] = int(value)
+
+    def set_search_size(self, area):
+        self.parents = self.get_buffer((area,))
+        self.queue = self.get_buffer((area,))
+
+    def cast_rays(self, x, y, angle):
+        n = self.kernels['cast_rays'](self.grid, x, y, angle, NUM_RAYS, MAX_DEPTH, HALF_FOV, DELTA_ANGLE,
+                                      SCREEN_DIST, self.out, self.transparent)
+        while n < 0:
+            self.out = self.get_buffer((2 * len(self.out), 7))
+            n = self.kernels['cast_rays'](self.grid, x, y, angle, NUM_RAYS, MAX_DEPTH, HALF_FOV, DELTA_ANGLE,
+                                          SCREEN_DIST, self.out, self.transparent)
+        return [(int(ray), depth, proj_height, int(texture), offset, int(tile_x), int(tile_y))
+                for ray, depth, proj_height, texture, offset, tile_x, tile_y in self.get_rows(n)]
+
+    def line_of_sight(self, x, y, target, angle):
+        return bool(self.kernels['line_of_sight'](self.grid, x, y, target[0], target[1], angle, MAX_DEPTH))
+
+    def next_step(self, start, goal, bounds, blocked=()):
+        x0, y0, x1, y1 = bounds
+        if (x1 - x0) * (y1 - y0) > len(self.parents):
+            self.set_search_size((x1 - x0) * (y1 - y0))
+        step = self.kernels['bfs_step'](self.grid, *start, *goal, *bounds, self.get_coords(blocked),
+                                        self.parents, self.queue)
+        return (int(step[0]), int(step[1])) if step[0] >= 0 else None
+
+    def get_distances(self, sources, targets, bounds):
+        # rows of step counts inside bounds from each source to each target, -1 when unreachable
+        x0, y0, x1, y1 = bounds
+        if (x1 - x0) * (y1 - y0) > len(self.parents):
+            self.set_search_size((x1 - x0) * (y1 - y0))
+        out = self.get_buffer((len(sources) * len(targets),))
+        self.kernels['cluster_distances'](self.grid, *bounds, self.get_coords(sources), self.get_coords(targets),
+                                          out, self.parents, self.queue)
+        out = list(map(int, out))
+        return [out[i * len(targets):(i + 1) * len(targets)] for i in range(len(sources))]
+
+    def project_sprite(self, dx, dy, angle):
+        return self.kernels['project_sprite'](dx, dy, angle, DELTA_ANGLE, HALF_NUM_RAYS, SCALE)
+
+
+class NumbaKernels(PythonKernels):
+    name = 'numba'
+
+    def __init__(self):
+        super().__init__()
+        self.warm_up()
+
+    def get_kernels(self):
+        # explicit signatures compile on load, cache=True keeps the machine code between runs
+        return {kernel.__name__: numba.njit(SIGNATURES[kernel.__name__], cache=True)(kernel) for kernel in KERNELS}
+
+    def get_grid(self, rows):
+        return np.array(super().get_grid(rows), dtype=np.int64)
+
+    def get_buffer(self, shape):
+        return np.zeros(shape, dtype=np.int64 if len(shape) == 1 else np.float64)
+
+    def get_coords(self, positions):
+        return np.array(super().get_coords(positions), dtype=np.int64)
+
+    def get_rows(self, n):
+        return self.out[:n].tolist()
+
+    def warm_up(self):
+        # first calls run outside the frame loop
+        grid = self.grid
+        self.set_map([[1, 1, 1], [1, 0, 1], [1, 1, 1]])
+        self.cast_rays(1.5, 1.5, 0.0)
+        self.line_of_sight(1.5, 1.5, (1, 1), 0.0)
+        self.next_step((1, 1), (1, 1), (0, 0, 3, 3), [(1, 1)])
+        self.get_distances([(1, 1)], [(1, 1)], (0, 0, 3, 3))
+        self.project_sprite(1.0, 1.0, 0.0)
+        self.grid = grid
+
+
+def get_kernels(backend=KERNEL_BACKEND):
+    if backend == 'python':
+        return PythonKernels()
+    if numba is None:
+        if backend == 'numba':
+            raise ImportError('the numba kernel backend needs numba installed')
+        return PythonKernels()
+    try:
+        return NumbaKernels()
+    except Exception as error:
+        if backend == 'numba':
+            raise
+        print(f'numba kernels failed to compile, using the python backend: {error}')
+        return PythonKernels()
+
+
+def get_random_grid(rng, size, density=0.15):
+    grid = [[1 if x in (0, size - 1) or y in (0, size - 1) else 0 for x in range(size)] for y in range(size)]
+    for y in range(1, size - 1):
+        for x in range(1, size - 1):
+            if rng.random() < density:
+                grid[y][x] = rng.choice((1, 2, 3, 4, 5))
+    return grid
+
+
+def check_conformance(reference, candidate, grids, samples=100, seed=0):
+    # runs both backends on the same random queries and returns a description of every mismatch
+    rng = random.Random(seed)
+    errors = []
+
+    def compare(name, a, b):
+        if isinstance(a, list):
+            if len(a) != len(b):
+                errors.append(f'{name}: {len(a)} rows != {len(b)} rows')
+            for u, v in zip(a, b):
+                compare(name, u, v)
+        elif a != b and not (isinstance(a, tuple) and isinstance(b, tuple) and len(a) == len(b)
+                             and all(math.isclose(u, v, rel_tol=1e-9, abs_tol=1e-9) for u, v in zip(a, b))):
+            errors.append(f'{name}: {a} != {b}')
+
+    for index, grid in enumerate(grids):
+        reference.set_map(grid)
+        candidate.set_map(grid)
+        height, width = len(grid), max(len(row) for row in grid)
+        tiles = [(x, y) for y, row in enumerate(grid) for x, value in enumerate(row) if not value]
+        for _ in range(samples):
+            (tx, ty), target = rng.choice(tiles), rng.choice(tiles)
+            x, y, angle = tx + rng.random(), ty + rng.random(), rng.uniform(0, math.tau)
+            query = f'map {index} at ({x:.3f}, {y:.3f}, {angle:.3f})'
+            compare(f'cast_rays {query}', reference.cast_rays(x, y, angle), candidate.cast_rays(x, y, angle))
+            theta = math.atan2(target[1] + 0.5 - y, target[0] + 0.5 - x)
+            compare(f'line_of_sight {query} to {target}', reference.line_of_sight(x, y, target, theta),
+                    candidate.line_of_sight(x, y, target, theta))
+            compare(f'project_sprite {query} to {target}', reference.project_sprite(target[0] - x, target[1] - y, angle),
+                    candidate.project_sprite(target[0] - x, target[1] - y, angle))
+
+            x0, y0 = rng.randrange(width), rng.randrange(height)
+            bounds = x0, y0, rng.randint(x0 + 1, width), rng.randint(y0 + 1, height)
+            inside = [(x, y) for x, y in tiles if bounds[0] <= x < bounds[2] and bounds[1] <= y < bounds[3]]
+            if inside:
+                start, goal = rng.choice(inside), rng.choice(inside)
+                blocked = rng.sample(inside, min(len(inside), 3))
+                compare(f'next_step map {index} {start} to {goal} in {bounds}',
+                        reference.next_step(start, goal, bounds, blocked), candidate.next_step(start, goal, bounds, blocked))
+                targets = rng.sample(inside, min(len(inside), 4))
+                compare(f'get_distances map {index} {blocked} to {targets} in {bounds}',
+                        reference.get_distances(blocked, targets, bounds), candidate.get_distances(blocked, targets, bounds))
+    return errors
+
+
+if __name__ == '__main__':
+    # conformance check: python kernels.py [samples per map]
+    if numba is None:
+        print('numba is not installed, only the python kernels are available')
+        sys.exit()
+    from map import mini_map
+    rng = random.Random(0)
+    grids = [mini_map] + [get_random_grid(rng, size) for size in (8, 16, 32, 64)]
+    errors = check_conformance(PythonKernels(), NumbaKernels(), grids, int(sys.argv[1]) if len(sys.argv) > 1 else 100)
+    for error in errors[:20]:
+        print(error)
+    print(f'{len(errors)} mismatches between the python and numba kernels on {len(grids)} maps')
+    sys.exit(1 if errors else 0)
@@ -0,0 +1,64 @@
+import math
+import random
+from collections import deque
+from settings import *
+
+# Procedural levels for stress tests and simulations. The map is split in rooms of room_size
+# tiles and every wall between two rooms has an open gap and a door. Inside the rooms wall
+# tiles are scattered with the given density, and the NPCs are placed on tiles reachable from
+# the player spawn.
+
+WALL_TEXTURES = 1, 2, 3, 4
+TRANSPARENT_WALL = 5
+DOOR_TEXTURE = 3
+
+
+def generate_level(size=32, density=0.08, npcs=8, seed=0, room_size=8):
+    # returns mini_map, the door tiles and the npc positions
+    rng = random.Random(seed)
+    grid = [[1 if x in (0, size - 1) or y in (0, size - 1) else False for x in range(size)] for y in range(size)]
+    doors = set()
+    px, py = PLAYER_POS
+    clear = {(x, y) for x in range(px - 1, px + 2) for y in range(py - 1, py + 2)}
+
+    walls = range(room_size, size - 2, room_size) if room_size else ()
+    for wall in walls:
+        for i in range(1, size - 1):
+            grid[i][wall] = grid[wall][i] = 1
+    for wall in walls:
+        for start in range(0, size - 1, room_size):
+            segment = list(range(start + 1, min(start + room_size, size - 1)))
+            if len(segment) < 2:
+                continue
+            for vertical in (True, False):
+                gap, door = rng.sample(segment, 2)
+                for i, value in ((gap, False), (door, DOOR_TEXTURE)):
+                    x, y = (wall, i) if vertical else (i, wall)
+                    grid[y][x] = value
+                    # both sides of a doorway stay walkable
+                    clear.update(((x - 1, y), (x + 1, y)) if vertical else ((x, y - 1), (x, y + 1)))
+                doors.add((wall, door) if vertical else (door, wall))
+
+    for y in range(1, size - 1):
+        for x in range(1, size - 1):
+            if not grid[y][x] and (x, y) not in clear and rng.random() < density:
+                grid[y][x] = TRANSPARENT_WALL if rng.random() < 0.05 else rng.choice(WALL_TEXTURES)
+
+    spawn_tiles = sorted(tile for tile in get_reachable(grid, (px, py), doors) if math.dist(tile, (px, py)) > 3)
+    npc_positions = [(x + 0.5, y + 0.5) for x, y in rng.sample(spawn_tiles, min(npcs, len(spawn_tiles)))]
+    return grid, doors, npc_positions
+
+
+def get_reachable(grid, start, doors=()):
+    # open tiles connected to start, doors count as open
+    queue = deque([start])
+    reachable = {start}
+    while queue:
+        x, y = queue.popleft()
+        for next_tile in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            nx, ny = next_tile
+            if next_tile not in reachable and 0 <= ny < len(grid) and 0 <= nx < len(grid[ny]) \
+                    and (not grid[ny][nx] or next_tile in doors):
+                reachable.add(next_tile)
+                queue.append(next_tile)
+    return reachable - set(doors)
@@ -0,0 +1,53 @@
+import pygame as pg
+import numpy as np
+from settings import *
+
+
+class Lighting:
+    def __init__(self, game):
+        self.game = game
+        self.brightness = LIGHT_MIN + (1 - LIGHT_MIN) * np.arange(LIGHT_LEVELS) / (LIGHT_LEVELS - 1)
+        self.shade_table = self.get_shade_table()
+        self.shaded_cache = {}
+
+    def get_shade_table(self):
+        # colormap per light level: shade_table[level, channel, value] fades the value towards FOG_COLOR
+        values = np.arange(256, dtype=np.float32)
+        fog = np.array(FOG_COLOR, dtype=np.float32)
+        table = (values[None, None, :] * self.brightness[:, None, None]
+                 + fog[None, :, None] * (1 - self.brightness[:, None, None]))
+        return np.clip(table, 0, 255).astype(np.uint8)
+
+    @staticmethod
+    def get_level(depth, light=DEFAULT_LIGHT):
+        level = int((light / 255 - depth * LIGHT_FALLOFF) * (LIGHT_LEVELS - 1))
+        return max(0, min(LIGHT_LEVELS - 1, level))
+
+    def get_level_table(self, depths):
+        # level_table[light, i] is get_level(depths[i], light) for every light value 0-255
+        lights = np.arange(256, dtype=np.float32)[:, None] / 255
+        levels = (lights - np.asarray(depths, dtype=np.float32)[None, :] * LIGHT_FALLOFF) * (LIGHT_LEVELS - 1)
+        return np.clip(levels, 0, LIGHT_LEVELS - 1).astype(np.intp)
+
+    def shade_pixels(self, pixels, level):
+        # pixels is a (..., 3) uint8 view that is shaded in place
+        table = self.shade_table[level]
+        for channel in range(3):
+            pixels[..., channel] = table[channel].take(pixels[..., channel])
+
+    def shade_surface(self, surface, level):
+        shaded = surface.copy()
+        if level < LIGHT_LEVELS - 1:
+            pixels = pg.surfarray.pixels3d(shaded)
+            self.shade_pixels(pixels, level)
+            del pixels
+        return shaded
+
+    def get_shaded_levels(self, surface):
+        return [self.shade_surface(surface, level) for level in range(LIGHT_LEVELS)]
+
+    def get_shaded(self, surface, level):
+        key = surface, level
+        if key not in self.shaded_cache:
+            self.shaded_cache[key] = self.shade_surface(surface, level) if level < LIGHT_LEVELS - 1 else surface
+        return self.shaded_cache[key]
@@ -1,5 +1,6 @@
 import pygame as pg
 import sys
+from functools import cached_property
 from settings import *
 from map import *
 from player import *
@@ -10,29 +11,98 @@ from object_handler import *
 from weapon import *
 from sound import *
 from pathfinding import *
+from kernels import get_kernels
+from capture import FrameCapture
+from profiling import PhaseTimer
+from memory_tracker import MemoryTracker
 
 class Game:
-    def __init__(self):
-        pg.init()
-        pg.mouse.set_visible(False)
-        self.screen = pg.display.set_mode(RES)
+    headless = False
+
+    def __init__(self, mini_map=mini_map, doors=doors):
+        self.timer = PhaseTimer()
+        with self.timer.phase('pygame'):
+            pg.init()
+            pg.mouse.set_visible(False)
+            self.screen = pg.display.set_mode(RES)
         self.clock = pg.time.Clock()
         self.delta_time = 1
         self.global_trigger = False
         self.global_event = pg.USEREVENT + 0
         pg.time.set_timer(self.global_event, 40)
+        self.init_world(mini_map, doors)
+        self.memory_tracker = MemoryTracker(self) if MEMORY_TRACKING else None
+        self.capture = None
         self.new_game()
+        if CAPTURE:
+            self.toggle_capture()
+
+    def init_world(self, mini_map, doors):
+        # the map and everything that follows its tiles, shared with HeadlessGame
+        with self.timer.phase('map'):
+            self.map = Map(self, mini_map, doors)
+        with self.timer.phase('kernels'):
+            self.kernels = get_kernels()
+            self.kernels.set_map(self.map.mini_map)
+        self.map.subscribe(self.kernels.set_tiles)
+        self.map.subscribe(self.on_tiles_changed)
+
+    # Services live as long as the Game and are built on first use.
+    # Restarting a level only rebuilds the per session objects in new_game.
+    @cached_property
+    def object_renderer(self):
+        with self.timer.phase('object_renderer'):
+            return ObjectRenderer(self)
+
+    @cached_property
+    def sound(self):
+        with self.timer.phase('sound'):
+            return Sound(self)
+
+    @cached_property
+    def pathfinding(self):
+        with self.timer.phase('pathfinding'):
+            return PathFinding(self)
 
     def new_game(self):
-        self.map = Map(self)
-        self.player = Player(self)
-        self.object_renderer = ObjectRenderer(self)
-        self.raycasting = RayCasting(self)
-        self.object_handler = ObjectHandler(self)
-        self.weapon = Weapon(self)
-        self.sound = Sound(self)
-        self.pathfinding = PathFinding(self)
+        with self.timer.phase('new_game'):
+            self.map.reset()
+            self.clear_paths()
+            self.player = Player(self)
+            self.raycasting = RayCasting(self)
+            self.object_handler = ObjectHandler(self)
+            self.weapon = Weapon(self)
+        if self.memory_tracker:
+            self.memory_tracker.instrument()
         #self.sound.theme.play()
+        if PRINT_STARTUP_TIMES:
+            self.timer.report()
+
+    def clear_paths(self):
+        # pathfinding outlives a game but the paths it keeps belong to the NPCs of that game
+        if 'pathfinding' in vars(self):
+            self.pathfinding.path_cache.clear()
+
+    def on_tiles_changed(self, changes):
+        self.object_handler.on_tiles_changed(changes)
+
+    def toggle_capture(self):
+        if self.capture:
+            self.capture.stop()
+            self.capture = None
+        else:
+            self.capture = FrameCapture(self)
+            self.capture.start()
+
+    def get_ticks(self):
+        return pg.time.get_ticks()
+
+    def game_over(self):
+        self.object_renderer.game_over()
+        pg.display.flip()
+        self.sound.theme.stop()
+        pg.time.delay(1500)
+        self.new_game()
 
     def update(self):
         self.player.update()
@@ -42,11 +112,14 @@ class Game:
         pg.display.flip()
         self.delta_time = self.clock.tick(FPS)
         pg.display.set_caption(f'{self.clock.get_fps() :.1f}')
+        if self.memory_tracker:
+            self.memory_tracker.end_frame()
 
     def draw(self):
         # self.screen.fill('black')
         self.object_renderer.draw()
         self.weapon.draw()
+        self.object_renderer.draw_queue.flush()
         # self.map.draw()
         # self.player.draw()
 
@@ -54,10 +127,18 @@ class Game:
         self.global_trigger = False
         for event in pg.event.get():
             if event.type == pg.QUIT or (event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE):
+                if self.memory_tracker:
+                    self.memory_tracker.report()
+                if self.capture:
+                    self.capture.stop()
                 pg.quit()
                 sys.exit()
             elif event.type == self.global_event:
                 self.global_trigger = True
+            elif event.type == pg.KEYDOWN and event.key == pg.K_F12:
+                self.toggle_capture()
+            elif event.type == pg.KEYDOWN and event.key == pg.K_e:
+                self.player.use()
             self.player.single_fire_event(event)
 
     def run(self):
@@ -65,6 +146,8 @@ class Game:
             self.check_events()
             self.update()
             self.draw()
+            if self.capture:
+                self.capture.capture()
 
 
 if __name__ == '__main__':
@@ -1,4 +1,5 @@
 import pygame as pg
+from settings import *
 
 _ = False
 
@@ -10,6 +11,38 @@ mini_map =[
 [2, 3, 2, 2, 2],
 ]
 
+# floor and ceiling textures by id
+floor_textures = {
+    1: 'resources/textures/10809-v4.jpg',
+    2: 'resources/textures/8301-v6.jpg',
+}
+
+# floor and ceiling texture ids for every tile of mini_map
+floor_map = [
+[1, 1, 1, 1, 1],
+[1, 1, 1, 1, 1],
+[1, 1, 1, 1, 1],
+[1, 1, 1, 1, 1],
+[1, 1, 1, 1, 1],
+]
+
+ceiling_map = [
+[2, 2, 2, 2, 2],
+[2, 2, 2, 2, 2],
+[2, 2, 2, 2, 2],
+[2, 2, 2, 2, 2],
+[2, 2, 2, 2, 2],
+]
+
+# light level (0-255) of every tile, wall tiles included
+light_map = [
+[255, 255, 255, 255, 255],
+[255, 255, 255, 255, 255],
+[255, 255, 255, 255, 255],
+[200, 200, 200, 200, 200],
+[200, 200, 200, 200, 200],
+]
+
 # mini_map =[
 # [1, 1, 1, 1, 1, 1, 1, 1, 4, 1, 4, 1, 1, 1, 1, 1], 
 # [1, _, _, _, _, 3, 3, _, _, _, _, 5, 5, 4, 4, 1], # 1
@@ -42,19 +75,87 @@ mini_map =[
 
 
 
+# tiles of mini_map that open and close, the player uses them with E
+doors = set()
+
 class Map:
-    def __init__(self, game):
+    def __init__(self, game, mini_map=mini_map, doors=doors, floor_map=floor_map, ceiling_map=ceiling_map,
+                 light_map=light_map):
         self.game = game
-        self.mini_map = mini_map
+        # tiles can change during a game, the level data passed in is never modified
+        self.mini_map = [list(row) for row in mini_map]
+        self.floor_map = self.get_tile_map(floor_map, 1)
+        self.ceiling_map = self.get_tile_map(ceiling_map, 2)
+        self.floor_textures = floor_textures
+        self.light_map = self.get_tile_map(light_map, DEFAULT_LIGHT)
         self.world_map = {}
+        self.doors = {(x, y): self.mini_map[y][x] for x, y in doors}
+        self.initial_tiles = {}
+        self.listeners = []
         self.get_map()
     
+    def get_tile_map(self, tile_map, value):
+        # per tile data that does not match the size of mini_map, like the maps above with a
+        # generated level, is replaced by a uniform map of the right size
+        if len(tile_map) == len(self.mini_map) and all(len(a) == len(b) for a, b in zip(tile_map, self.mini_map)):
+            return tile_map
+        return [[value] * len(row) for row in self.mini_map]
+
     def get_map(self):
         for j, row in enumerate(self.mini_map):
             for i, value in enumerate(row):
                 if value:
                     self.world_map[(i,j)] = value
     
+    def subscribe(self, listener):
+        # listener(changes) is called with {(x, y): new value} after every change of the map
+        self.listeners.append(listener)
+
+    def set_tiles(self, changes):
+        for x, y in changes:
+            if not (0 <= y < len(self.mini_map) and 0 <= x < len(self.mini_map[y])):
+                raise ValueError(f'tile {(x, y)} is outside the map')
+        for (x, y), value in changes.items():
+            self.initial_tiles.setdefault((x, y), self.mini_map[y][x])
+            self.mini_map[y][x] = value
+            if value:
+                self.world_map[(x, y)] = value
+            else:
+                self.world_map.pop((x, y), None)
+        if changes:
+            for listener in self.listeners:
+                listener(changes)
+
+    def set_tile(self, pos, value):
+        self.set_tiles({pos: value})
+
+    def open(self, pos):
+        if pos in self.doors and pos in self.world_map:
+            self.set_tile(pos, False)
+
+    def close(self, pos):
+        # a door never closes on the player or an NPC
+        blocked = pos == self.game.player.map_pos or pos in self.game.object_handler.npc_positions
+        if pos in self.doors and pos not in self.world_map and not blocked:
+            self.set_tile(pos, self.doors[pos])
+
+    def toggle(self, pos):
+        if pos in self.world_map:
+            self.open(pos)
+        else:
+            self.close(pos)
+
+    def reset(self):
+        # restores the tiles changed during the last game
+        self.set_tiles({(x, y): value for (x, y), value in self.initial_tiles.items() if self.mini_map[y][x] != value})
+        self.initial_tiles = {}
+
+    def get_light(self, pos):
+        x, y = pos
+        if 0 <= y < len(self.light_map) and 0 <= x < len(self.light_map[y]):
+            return self.light_map[y][x]
+        return DEFAULT_LIGHT
+
     def draw(self):
         [pg.draw.rect(self.game.screen, 'darkgray', (pos[0] * 100, pos[1] * 100, 100, 100), 2)
          for pos in self.world_map]
\ No newline at end of file
@@ -0,0 +1,153 @@
+import pygame as pg
+import os
+import statistics
+import tracemalloc
+from collections import deque
+from settings import *
+import assets
+from sound import SoundEffect
+
+# Opt-in memory instrumentation (MEMORY_TRACKING). Python allocations are attributed to the
+# subsystem that made them with tracemalloc; Surface pixels live outside the Python heap, so
+# asset categories are measured by walking the Surfaces each subsystem keeps alive.
+
+SUBSYSTEMS = {
+    'player.py': 'player',
+    'raycasting.py': 'raycasting',
+    'object_handler.py': 'object_handler',
+    'sprite_object.py': 'sprites',
+    'npc.py': 'npc',
+    'pathfinding.py': 'pathfinding',
+    'kernels.py': 'kernels',
+    'object_renderer.py': 'renderer',
+    'floor_casting.py': 'renderer',
+    'lighting.py': 'lighting',
+    'weapon.py': 'weapon',
+    'sound.py': 'sound',
+    'assets.py': 'assets',
+}
+
+
+def surface_bytes(surfaces):
+    # subsurfaces share the pixels of their parent
+    return sum(surface.get_pitch() * surface.get_height() for surface in surfaces if surface.get_parent() is None)
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1024:
+            return f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GB'
+
+
+class MemoryTracker:
+    def __init__(self, game):
+        self.game = game
+        tracemalloc.start()
+        self.frame = 0
+        self.sections = {}
+        self.frame_surfaces = 0
+        self.categories = {}
+        self.peaks = {}
+        self.subsystems = {}
+        self.totals = deque(maxlen=MEMORY_GROWTH_WINDOW)
+        self.growth = 0
+
+    def instrument(self):
+        game = self.game
+        for name, obj, method in (('player', game.player, 'update'),
+                                  ('raycasting', game.raycasting, 'update'),
+                                  ('object_handler', game.object_handler, 'update'),
+                                  ('weapon', game.weapon, 'update'),
+                                  ('renderer', game.object_renderer, 'draw')):
+            if method not in vars(obj):
+                setattr(obj, method, self.wrap(name, getattr(obj, method)))
+
+    def wrap(self, name, method):
+        def tracked(*args, **kwargs):
+            start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            result = method(*args, **kwargs)
+            current, peak = tracemalloc.get_traced_memory()
+            section = self.sections.setdefault(name, [0, 0, 0])
+            section[0] += peak - start
+            section[1] += current - start
+            section[2] = max(section[2], peak - start)
+            return result
+        return tracked
+
+    def get_categories(self):
+        game = self.game
+        categories = {'animation frames': surface_bytes(assets.get_cached_surfaces())}
+        if 'object_renderer' in vars(game):
+            renderer = game.object_renderer
+            textures = [*renderer.wall_textures.values(), renderer.wall_atlas.surface, renderer.digit_atlas.surface,
+                        renderer.sky_image, renderer.blood_screen, renderer.game_over_image]
+            categories['textures'] = surface_bytes(textures)
+            caches = surface_bytes(renderer.lighting.shaded_cache.values())
+            if renderer.floor_casting:
+                categories['textures'] += renderer.floor_casting.textures.nbytes
+                caches += renderer.floor_casting.framebuffer.nbytes
+            categories['caches'] = caches
+        if 'sound' in vars(game) and pg.mixer.get_init():
+            frequency, size, channels = pg.mixer.get_init()
+            sample_bytes = abs(size) // 8 * channels
+            effects = [value.sound for value in vars(game.sound).values() if isinstance(value, SoundEffect)]
+            categories['sounds'] = int(sum(effect.get_length() for effect in effects) * frequency * sample_bytes)
+        return categories
+
+    def take_snapshot(self):
+        snapshot = tracemalloc.take_snapshot()
+        subsystems = {}
+        for stat in snapshot.statistics('filename'):
+            name = SUBSYSTEMS.get(os.path.basename(stat.traceback[0].filename), 'other')
+            subsystems[name] = subsystems.get(name, 0) + stat.size
+        self.subsystems = subsystems
+
+    def sample(self):
+        for name, size in self.get_categories().items():
+            history = self.categories.setdefault(name, deque(maxlen=MEMORY_GROWTH_WINDOW))
+            history.append(size)
+            self.peaks[name] = max(self.peaks.get(name, 0), size)
+        total = tracemalloc.get_traced_memory()[0] + sum(history[-1] for history in self.categories.values())
+        self.totals.append(total)
+        self.growth = self.get_growth()
+
+    def get_growth(self):
+        # least squares slope of the sampled totals, in bytes per minute
+        if len(self.totals) < self.totals.maxlen:
+            return 0
+        n = len(self.totals)
+        mean_x, mean_y = (n - 1) / 2, statistics.fmean(self.totals)
+        slope = (sum((i - mean_x) * (total - mean_y) for i, total in enumerate(self.totals))
+                 / sum((i - mean_x) ** 2 for i in range(n)))
+        return slope * FPS * 60 / MEMORY_SAMPLE_INTERVAL
+
+    def end_frame(self):
+        self.frame += 1
+        self.frame_surfaces += len(self.game.raycasting.objects_to_render)
+        if self.frame % MEMORY_SAMPLE_INTERVAL == 0:
+            self.sample()
+        if self.frame % MEMORY_SNAPSHOT_INTERVAL == 0:
+            self.take_snapshot()
+        if self.frame % MEMORY_REPORT_INTERVAL == 0:
+            self.report()
+
+    def report(self):
+        frames = max(self.frame, 1)
+        print(f'memory after {self.frame} frames, {self.frame_surfaces / frames:.0f} new surfaces per frame')
+        print(f"  {'subsystem':<18}{'alloc/frame':>14}{'retained/frame':>16}{'peak frame':>14}")
+        for name, (allocated, retained, peak) in self.sections.items():
+            print(f'  {name:<18}{format_bytes(allocated / frames):>14}{format_bytes(retained / frames):>16}'
+                  f'{format_bytes(peak):>14}')
+        if self.subsystems:
+            print(f"  {'python heap':<18}{'retained':>14}")
+            for name, size in sorted(self.subsystems.items(), key=lambda item: -item[1]):
+                print(f'  {name:<18}{format_bytes(size):>14}')
+        print(f"  {'assets':<18}{'current':>14}{'steady':>16}{'peak':>14}")
+        for name, history in self.categories.items():
+            print(f'  {name:<18}{format_bytes(history[-1]):>14}{format_bytes(statistics.median(history)):>16}'
+                  f'{format_bytes(self.peaks[name]):>14}')
+        if self.growth > MEMORY_GROWTH_LIMIT:
+            print(f'  WARNING: memory is growing steadily, {format_bytes(self.growth)} per minute')
@@ -0,0 +1,22 @@
+import pygame as pg
+import math
+from settings import *
+
+# Mip chains: each level halves the previous one with smoothscale, down to MIP_MIN_SIZE pixels.
+# A surface drawn smaller than its size is scaled from the smallest level that is still as big
+# as the target, so the final scale is cheap and never skips most of the source pixels.
+
+
+def get_mip_chain(surface, min_size=MIP_MIN_SIZE):
+    chain = [surface]
+    width, height = surface.get_size()
+    while min(width, height) // 2 >= min_size:
+        width, height = width // 2, height // 2
+        chain.append(pg.transform.smoothscale(chain[-1], (width, height)))
+    return chain
+
+
+def get_mip_level(size, target, levels):
+    if target >= size:
+        return 0
+    return min(levels - 1, int(math.log2(size / max(target, 1))))
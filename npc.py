@@ -29,7 +29,7 @@ class NPC(AnimatedSprite):
         # self.draw_ray_cast()
 
     def movement(self):
-        next_pos = self.game.pathfinding.get_path(self.map_pos, self.game.player.map_pos)
+        next_pos = self.game.pathfinding.get_path(self.map_pos, self.game.player.map_pos, self)
         next_x, next_y = next_pos
 
         if next_pos not in self.game.object_handler.npc_positions:
@@ -40,7 +40,7 @@ class NPC(AnimatedSprite):
 
     def attack(self):
         if self.animation_trigger:
-            self.game.sound.npc_shot.play()
+            self.game.sound.npc_shot.play((self.x, self.y))
             if random() < self.accuracy:
                 self.game.player.get_damage(self.attack_damage)
 
@@ -59,6 +59,8 @@ class NPC(AnimatedSprite):
                 self.death_images.rotate(-1)
                 self.image = self.death_images[0]
                 self.frame_counter += 1
+            elif self.frame_counter >= len(self.death_images) - 1:
+                self.game.object_handler.add_decal(self)
 
     def animate_pain(self):
         self.animate(self.pain_images)
@@ -68,7 +70,7 @@ class NPC(AnimatedSprite):
     def check_hit_in_npc(self):
         if self.ray_cast_value and self.game.player.shot:
             if HALF_WIDTH - self.sprite_half_width < self.screen_x < HALF_WIDTH + self.sprite_half_width:
-                self.game.sound.npc_pain.play()
+                self.game.sound.npc_pain.play((self.x, self.y))
                 self.game.player.shot = False
                 self.pain = True
                 self.health -= self.game.weapon.damage
@@ -77,7 +79,7 @@ class NPC(AnimatedSprite):
     def check_health(self):
         if self.health < 1:
             self.alive = False
-            self.game.sound.npc_death.play()
+            self.game.sound.npc_death.play((self.x, self.y))
 
 
     def run_logic(self):
@@ -103,73 +105,9 @@ class NPC(AnimatedSprite):
         else:
             self.animate_death()
 
-    @property
-    def map_pos(self):
-        return int(self.x), int(self.y)
-    
     def ray_cast_player_npc(self):
-        if self.game.player.map_pos == self.map_pos:
-            return True
-        
-        wall_dist_v, wall_dist_h = 0, 0
-        player_dist_v, player_dist_h = 0, 0
-        
-        ox, oy = self.game.player.pos
-        x_map, y_map = self.game.player.map_pos
-
-        ray_angle = self.theta
-
-        sin_a = math.sin(ray_angle)
-        cos_a = math.cos(ray_angle)
-
-        # horizontals
-        y_hor, dy = (y_map + 1, 1) if sin_a > 0 else (y_map - 1e-6, -1)
-
-        depth_hor = (y_hor - oy) / sin_a
-        x_hor = ox + depth_hor * cos_a
-
-        delta_depth = dy / sin_a
-        dx = delta_depth * cos_a
-
-        for i in range(MAX_DEPTH):
-            tile_hor = int(x_hor), int(y_hor)
-            if tile_hor == self.map_pos:
-                player_dist_h = depth_hor
-                break
-            if tile_hor in self.game.map.world_map:
-                wall_dist_h = depth_hor
-                break
-            x_hor += dx
-            y_hor += dy
-            depth_hor += delta_depth
-
-        # verticals
-        x_vert, dx = (x_map + 1, 1) if cos_a > 0 else (x_map - 1e-6, -1)
-
-        depth_vert = (x_vert - ox) / cos_a
-        y_vert = oy + depth_vert * sin_a
-
-        delta_depth = dx / cos_a
-        dy = delta_depth * sin_a
-
-        for i in range(MAX_DEPTH):
-            tile_vert = int(x_vert), int(y_vert)
-            if tile_vert == self.map_pos:
-                player_dist_v = depth_vert
-                break
-            if tile_vert in self.game.map.world_map:
-                wall_dist_v = depth_vert
-                break
-            x_vert += dx
-            y_vert += dy
-            depth_vert += delta_depth
-
-        player_dist = max(player_dist_v, player_dist_h)
-        wall_dist = max(wall_dist_v, wall_dist_h)
-
-        if 0 < player_dist < wall_dist or not wall_dist:
-            return True
-        return False
+        player = self.game.player
+        return self.game.kernels.line_of_sight(player.x, player.y, self.map_pos, self.theta)
 
     def draw_ray_cast(self):
         pg.draw.circle(self.game.screen, "red", (100 * self.x, 100 * self.y), 15)
@@ -1,5 +1,7 @@
 from sprite_object import *
 from npc import *
+import heapq
+from itertools import count
 
 class ObjectHandler:
     def __init__(self, game):
@@ -11,7 +13,26 @@ class ObjectHandler:
         self.animated_sprite_path = "resources/sprites/animated_sprites/"
         add_sprite = self.add_sprite
         add_npc = self.add_npc
-        self.npc_positions = {}
+        self.npc_positions = set()
+
+        # Entities far from the player sleep and skip their updates until a wake condition fires:
+        # the player enters their region, a line of sight opens, a sound or a timer. The ones
+        # within MAX_DEPTH are still projected so they do not vanish from view.
+        self.active_sprites = []
+        self.active_npcs = []
+        self.decals = set()
+        self.active_decals = []
+        self.new_decals = []
+        self.dormant = {}
+        self.dormant_regions = {}
+        self.dormant_npc_positions = set()
+        self.wake_timers = []
+        self.wake_times = {}
+        self.timer_ids = count()
+        self.timer_woken = []
+        self.player_region = None
+        self.near_regions = set()
+        self.view_regions = set()
 
         add_sprite(SpriteObject(game, pos=(2.5,3.5)))
         #add_sprite(SpriteObject(game, pos=(10.5,1.5)))
@@ -48,11 +69,156 @@ class ObjectHandler:
 
     def add_npc(self, npc):
         self.npc_list.append(npc)
+        self.active_npcs.append(npc)
 
     def add_sprite(self, sprite):
         self.sprite_list.append(sprite)
+        self.active_sprites.append(sprite)
+
+    def add_decal(self, npc):
+        # a dead NPC whose death animation has finished is only drawn from now on
+        self.new_decals.append(npc)
+
+    @staticmethod
+    def get_region(x, y):
+        return int(x) // ACTIVATION_REGION_SIZE, int(y) // ACTIVATION_REGION_SIZE
+
+    def get_regions(self, x, y, radius):
+        rx, ry = self.get_region(x, y)
+        return [(rx + i, ry + j) for i in range(-radius, radius + 1) for j in range(-radius, radius + 1)]
+
+    def get_active_list(self, entity):
+        if entity in self.decals:
+            return self.active_decals
+        if isinstance(entity, NPC):
+            return self.active_npcs
+        return self.active_sprites
+
+    def is_sleepable(self, entity):
+        if isinstance(entity, NPC) and entity not in self.decals:
+            return entity.alive and not entity.player_search_trigger and not entity.pain
+        return True
+
+    def sleep(self, entity, until=None):
+        # until is a game tick at which the entity wakes up again
+        if entity in self.dormant:
+            return
+        self.get_active_list(entity).remove(entity)
+        region = self.get_region(entity.x, entity.y)
+        self.dormant[entity] = region
+        self.dormant_regions.setdefault(region, set()).add(entity)
+        if until is not None:
+            self.set_wake_timer(entity, until)
+        if isinstance(entity, NPC) and entity.alive:
+            self.dormant_npc_positions.add(entity.map_pos)
+
+    def set_wake_timer(self, entity, until):
+        # a timer that is replaced or whose entity wakes earlier stays in the heap and is skipped
+        self.wake_times[entity] = until
+        heapq.heappush(self.wake_timers, (until, next(self.timer_ids), entity))
+
+    def get_wake_time(self, entity):
+        # dormant animated sprites in view wake up for every frame of their animation
+        if isinstance(entity, AnimatedSprite) and not isinstance(entity, NPC) \
+                and self.get_region(entity.x, entity.y) in self.view_regions:
+            return entity.animation_time_prev + entity.animation_time + 1
+        return None
+
+    def sleep_if_far(self, entity):
+        if self.get_region(entity.x, entity.y) not in self.near_regions and self.is_sleepable(entity):
+            self.sleep(entity, self.get_wake_time(entity))
+
+    def wake(self, entity):
+        region = self.dormant.pop(entity, None)
+        if region is None:
+            return
+        self.dormant_regions[region].discard(entity)
+        if not self.dormant_regions[region]:
+            del self.dormant_regions[region]
+        self.wake_times.pop(entity, None)
+        self.get_active_list(entity).append(entity)
+        if isinstance(entity, NPC) and entity.alive:
+            self.dormant_npc_positions.discard(entity.map_pos)
+
+    def wake_by_sound(self, pos, radius=SOUND_WAKE_RADIUS):
+        x, y = pos
+        for region in self.get_regions(x, y, radius // ACTIVATION_REGION_SIZE + 1):
+            for npc in list(self.dormant_regions.get(region, ())):
+                if isinstance(npc, NPC) and npc.alive and math.hypot(npc.x - x, npc.y - y) <= radius:
+                    self.wake(npc)
+
+    def on_tiles_changed(self, changes):
+        # the NPCs around a door that opens or a wall that breaks hear it
+        for (x, y), value in changes.items():
+            if not value:
+                self.wake_by_sound((x + 0.5, y + 0.5), DOOR_WAKE_RADIUS)
+
+    def check_sight(self):
+        player = self.game.player
+        for region in self.get_regions(player.x, player.y, MAX_DEPTH // ACTIVATION_REGION_SIZE + 1):
+            for npc in list(self.dormant_regions.get(region, ())):
+                if isinstance(npc, NPC) and npc.alive and math.hypot(npc.x - player.x, npc.y - player.y) < MAX_DEPTH:
+                    npc.theta = math.atan2(npc.y - player.y, npc.x - player.x)
+                    if npc.ray_cast_player_npc():
+                        self.wake(npc)
+
+    def project_dormant(self):
+        # dormant entities in view distance are drawn as they are, only their updates are skipped
+        player = self.game.player
+        for region in self.view_regions:
+            for entity in self.dormant_regions.get(region, ()):
+                if math.hypot(entity.x - player.x, entity.y - player.y) < MAX_DEPTH:
+                    entity.get_sprite()
+
+    def check_player_region(self):
+        region = self.get_region(self.game.player.x, self.game.player.y)
+        if region == self.player_region:
+            return
+        self.player_region = region
+        player = self.game.player
+        self.near_regions = set(self.get_regions(player.x, player.y, ACTIVATION_RADIUS))
+        self.view_regions = set(self.get_regions(player.x, player.y, MAX_DEPTH // ACTIVATION_REGION_SIZE + 1))
+        for near_region in self.near_regions:
+            for entity in list(self.dormant_regions.get(near_region, ())):
+                self.wake(entity)
+        for active in (self.active_sprites, self.active_npcs, self.active_decals):
+            for entity in list(active):
+                self.sleep_if_far(entity)
+        # the ones that came into view start their timers
+        for view_region in self.view_regions:
+            for entity in self.dormant_regions.get(view_region, ()):
+                until = None if entity in self.wake_times else self.get_wake_time(entity)
+                if until is not None:
+                    self.set_wake_timer(entity, until)
+
+    def check_timers(self):
+        # entities woken by a timer get one update and go back to sleep if they are still far
+        time_now = self.game.get_ticks()
+        self.timer_woken = []
+        while self.wake_timers and self.wake_timers[0][0] <= time_now:
+            until, _, entity = heapq.heappop(self.wake_timers)
+            if self.wake_times.get(entity) == until:
+                self.wake(entity)
+                self.timer_woken.append(entity)
+
+    def check_wake_conditions(self):
+        self.check_player_region()
+        self.check_timers()
+        if self.game.global_trigger and self.dormant_regions:
+            self.check_sight()
 
     def update(self):
-        self.npc_positions = {npc.map_pos for npc in self.npc_list if npc.alive}
-        [sprite.update() for sprite in self.sprite_list]
-        [npc.update() for npc in self.npc_list]
\ No newline at end of file
+        self.check_wake_conditions()
+        self.npc_positions = {npc.map_pos for npc in self.active_npcs if npc.alive}
+        self.npc_positions |= self.dormant_npc_positions
+        [sprite.update() for sprite in self.active_sprites]
+        [npc.update() for npc in self.active_npcs]
+        [decal.get_sprite() for decal in self.active_decals]
+        self.project_dormant()
+        [self.sleep_if_far(entity) for entity in self.timer_woken]
+
+        for npc in self.new_decals:
+            self.active_npcs.remove(npc)
+            self.decals.add(npc)
+            self.active_decals.append(npc)
+        self.new_decals = []
\ No newline at end of file
@@ -1,19 +1,28 @@
 import pygame as pg
 from settings import * 
+from floor_casting import FloorCasting
+from lighting import Lighting
+from atlas import TextureAtlas
+from mipmap import get_mip_chain
+from draw_queue import DrawQueue
 
 class ObjectRenderer:
     def __init__(self,game):
         self.game = game
         self.screen = game.screen
+        self.draw_queue = DrawQueue(self.screen)
+        self.lighting = Lighting(game)
         self.wall_textures = self.load_wall_textures()
+        self.wall_atlas, self.shaded_wall_textures = self.load_wall_atlas()
         self.sky_image = self.get_texture("resources/textures/sky.png", (WIDTH, HALF_HEIGHT))
         self.sky_offset = 0
         self.blood_screen = self.get_texture("resources/textures/blood_screen.png", RES)
         self.digit_size = 90
-        self.digit_images = [self.get_texture(f"resources/textures/digits/{i}.png", [self.digit_size] * 2)
-                             for i in range(11)]
-        self.digits = dict(zip(map(str, range(11)),self.digit_images))
+        self.digit_atlas = TextureAtlas([self.get_texture(f"resources/textures/digits/{i}.png", [self.digit_size] * 2)
+                                         for i in range(11)])
+        self.digits = dict(zip(map(str, range(11)), self.digit_atlas.rects))
         self.game_over_image = self.get_texture('resources/textures/game_over.png', RES)
+        self.floor_casting = FloorCasting(game, self.lighting) if FLOOR_CASTING else None
 
     def draw(self):
         self.draw_background()
@@ -26,14 +35,17 @@ class ObjectRenderer:
     def draw_player_health(self):
         health = str(self.game.player.health)
         for i, char in enumerate(health):
-            self.screen.blit(self.digits[char], (i * self.digit_size, 0))
-        self.screen.blit(self.digits['10'], ((i + 1) * self.digit_size, 0))
+            self.draw_queue.add(self.digit_atlas.surface, (i * self.digit_size, 0), self.digits[char])
+        self.draw_queue.add(self.digit_atlas.surface, ((i + 1) * self.digit_size, 0), self.digits['10'])
 
 
     def player_damage(self):
         self.screen.blit(self.blood_screen, (0,0))
 
     def draw_background(self):
+        if self.floor_casting:
+            self.floor_casting.draw()
+            return
         self.sky_offset = (self.sky_offset + 4.5 * self.game.player.rel) % WIDTH
         self.screen.blit(self.sky_image, (-self.sky_offset, 0))
         self.screen.blit(self.sky_image, (-self.sky_offset + WIDTH, 0))
@@ -56,9 +68,9 @@ class ObjectRenderer:
                 combined_image.blit(image, (0, 0))
 
                 # Blit the combined image to the screen
-                self.screen.blit(combined_image, pos)
+                self.draw_queue.add(combined_image, pos)
             else:
-                self.screen.blit(image, pos)
+                self.draw_queue.add(image, pos)
 
     @staticmethod
     def get_texture(path, res=(TEXTURE_SIZE, TEXTURE_SIZE)):
@@ -73,3 +85,18 @@ class ObjectRenderer:
             4: self.get_texture('resources/textures/4.png'),
             5: self.get_texture('resources/textures/5.png')
         }
+
+    def load_wall_atlas(self):
+        # every mip of every light level of every wall texture lives in one atlas,
+        # addressed as rects[texture_id][level][mip]
+        keys, surfaces = [], []
+        for texture_id, texture in self.wall_textures.items():
+            for level, shaded in enumerate(self.lighting.get_shaded_levels(texture)):
+                for mip in get_mip_chain(shaded):
+                    keys.append((texture_id, level))
+                    surfaces.append(mip)
+        atlas = TextureAtlas(surfaces)
+        rects = {texture_id: [[] for _ in range(LIGHT_LEVELS)] for texture_id in self.wall_textures}
+        for (texture_id, level), rect in zip(keys, atlas.rects):
+            rects[texture_id][level].append(rect)
+        return atlas, rects
@@ -1,45 +1,225 @@
-from collections import deque
+import heapq
+from settings import *
+
+# Hierarchical pathfinding (HPA*): the grid is split in CLUSTER_SIZE square clusters connected
+# through entrance tiles on their borders. The distances between the entrances of every cluster are
+# computed at load by the compute kernels. Long queries search the small graph of entrances and
+# only the way to the first entrance is refined tile by tile.
 
 class PathFinding:
     def __init__(self,game):
         self.game = game
         self.map = game.map.mini_map
-        self.ways = [-1, 0], [0, -1], [1, 0], [0, 1], [-1, -1], [1, -1], [1, 1], [-1, 1]
-        self.graph = {}
+        self.width = max(len(row) for row in self.map)
+        self.height = len(self.map)
+        self.borders = {}
+        self.entrances = {}
+        self.inter_edges = {}
+        self.intra_edges = {}
+        self.path_cache = {}
         self.get_graph()
+        game.map.subscribe(self.update_tiles)
 
-    def get_next_nodes(self, x, y):
-        return [(x + dx, y + dy) for dx, dy in self.ways if (x + dx, y + dy) not in self.game.map.world_map]
-    
-    def get_path(self, start, goal):
-        self.visited = self.bfs(start, goal, self.graph)
-        path = [goal]
-        step = self.visited.get(goal, start)
+    def is_open(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and (x, y) not in self.game.map.world_map
+
+    @staticmethod
+    def get_cluster(pos):
+        return pos[0] // CLUSTER_SIZE, pos[1] // CLUSTER_SIZE
+
+    def get_bounds(self, *clusters):
+        cx0 = min(cx for cx, cy in clusters)
+        cy0 = min(cy for cx, cy in clusters)
+        cx1 = max(cx for cx, cy in clusters) + 1
+        cy1 = max(cy for cx, cy in clusters) + 1
+        return (cx0 * CLUSTER_SIZE, cy0 * CLUSTER_SIZE,
+                min(cx1 * CLUSTER_SIZE, self.width), min(cy1 * CLUSTER_SIZE, self.height))
+
+    def get_path(self, start, goal, owner=None):
+        start_cluster, goal_cluster = self.get_cluster(start), self.get_cluster(goal)
+        if max(abs(start_cluster[0] - goal_cluster[0]), abs(start_cluster[1] - goal_cluster[1])) <= 1:
+            step = self.next_step(start, goal, self.get_bounds(start_cluster, goal_cluster))
+            if step:
+                return step
+
+        waypoint = self.get_waypoint(start, goal, owner)
+        if waypoint is None:
+            return goal
+        step = self.next_step(start, waypoint, self.get_bounds(start_cluster, self.get_cluster(waypoint)))
+        return step if step else goal
+
+    def next_step(self, start, goal, bounds):
+        # breadth first search around the other NPCs, run by the compute kernels
+        return self.game.kernels.next_step(start, goal, bounds, self.game.object_handler.npc_positions)
+
+    def get_links(self, pos):
+        # step counts from pos to the entrances of its cluster, other NPCs are ignored
+        cluster = self.get_cluster(pos)
+        nodes = list(self.entrances.get(cluster, ()))
+        if not nodes:
+            return {}
+        distances = self.game.kernels.get_distances([pos], nodes, self.get_bounds(cluster))[0]
+        return {node: distance for node, distance in zip(nodes, distances) if distance >= 0}
+
+    def get_waypoint(self, start, goal, owner=None):
+        # the abstract path of an owner is kept while the goal stays in the same cluster and the
+        # owner stays next to its next waypoint, the map changing clears every path
+        key = owner if owner is not None else (start, goal)
+        goal_cluster = self.get_cluster(goal)
+        if key in self.path_cache:
+            path_goal, path = self.path_cache[key]
+            if path_goal == goal_cluster:
+                if path is None:
+                    return None
+                while path and path[-1] == start:
+                    path.pop()
+                if path and self.is_near(start, path[-1]):
+                    return path[-1]
+        if len(self.path_cache) > PATH_CACHE_SIZE:
+            self.path_cache.clear()
+        path = self.search_abstract(start, goal)
+        self.path_cache[key] = goal_cluster, path
+        return path[-1] if path else None
+
+    def is_near(self, a, b):
+        (ax, ay), (bx, by) = self.get_cluster(a), self.get_cluster(b)
+        return max(abs(ax - bx), abs(ay - by)) <= 1
 
-        while step and step != start:
-            path.append(step)
-            step = self.visited[step]
-        return path[-1]
+    def search_abstract(self, start, goal):
+        if not self.is_open(*goal):
+            return None
+        start_links = self.get_links(start)
+        goal_links = self.get_links(goal)
+        if not start_links or not goal_links:
+            return None
 
-    def bfs(self,start,goal,graph):
-        queue = deque([start])
-        visited = {start: None}
-        
+        # ties on f are broken towards the deepest node, which keeps the open list small
+        queue = [(0, 0, start)]
+        came_from = {start: None}
+        costs = {start: 0}
         while queue:
-            cur_node = queue.popleft()
-            if cur_node == goal:
+            _, cost, node = heapq.heappop(queue)
+            cost = -cost
+            if node == goal:
                 break
-            next_nodes = graph[cur_node]
+            if cost > costs[node]:
+                continue
+            next_nodes = self.get_abstract_edges(node).items()
+            if node == start:
+                next_nodes = list(next_nodes) + list(start_links.items())
+            if node in goal_links:
+                next_nodes = list(next_nodes) + [(goal, goal_links[node])]
+            for next_node, step_cost in next_nodes:
+                new_cost = cost + step_cost
+                if new_cost < costs.get(next_node, new_cost + 1):
+                    costs[next_node] = new_cost
+                    came_from[next_node] = node
+                    heuristic = max(abs(goal[0] - next_node[0]), abs(goal[1] - next_node[1]))
+                    heapq.heappush(queue, (new_cost + heuristic, -new_cost, next_node))
 
-            for next_node in next_nodes:
-                if next_node not in visited and next_node not in self.game.object_handler.npc_positions:
-                    queue.append(next_node)
-                    visited[next_node] = cur_node
-        
-        return visited
+        if goal not in came_from:
+            return None
+        # from the goal back to the first waypoint, so the next waypoint is always the last item
+        path = [goal]
+        while came_from[path[-1]] != start:
+            path.append(came_from[path[-1]])
+        return path
+
+    def get_abstract_edges(self, node):
+        return self.intra_edges.get(self.get_cluster(node), {}).get(node, {})
+
+    def get_intra_edges(self, cluster):
+        # kept until the cluster or a neighbour changes; the edges leaving the cluster are merged in
+        # so a search step is a single lookup
+        nodes = list(self.entrances[cluster])
+        rows = self.game.kernels.get_distances(nodes, nodes, self.get_bounds(cluster))
+        edges = {}
+        for node, distances in zip(nodes, rows):
+            edges[node] = {other: distance for other, distance in zip(nodes, distances) if other != node and distance >= 0}
+            for next_node in self.inter_edges.get(node, ()):
+                edges[node][next_node] = 1
+        return edges
+
+    def get_border(self, cluster, next_cluster):
+        (cx, cy), (nx, ny) = cluster, next_cluster
+        if nx == cx + 1:
+            x = nx * CLUSTER_SIZE
+            tiles = [((x - 1, y), (x, y)) for y in range(cy * CLUSTER_SIZE, min((cy + 1) * CLUSTER_SIZE, self.height))]
+        else:
+            y = ny * CLUSTER_SIZE
+            tiles = [((x, y - 1), (x, y)) for x in range(cx * CLUSTER_SIZE, min((cx + 1) * CLUSTER_SIZE, self.width))]
+
+        is_open = [(self.is_open(*a), self.is_open(*b)) for a, b in tiles]
+        runs, run, pairs = [], [], []
+        for i, (a, b) in enumerate(tiles):
+            if all(is_open[i]):
+                run.append((a, b))
+                continue
+            if run:
+                runs.append(run)
+                run = []
+            # openings that can only be crossed diagonally
+            for j in (i - 1, i + 1):
+                if 0 <= j < len(tiles) and is_open[i][0] and not is_open[j][0] and is_open[j][1]:
+                    pairs.append((a, tiles[j][1]))
+        if run:
+            runs.append(run)
+
+        # long openings get an entrance at each end, short ones a single entrance in the middle
+        for run in runs:
+            if len(run) > ENTRANCE_SPLIT:
+                pairs += [run[0], run[-1]]
+            else:
+                pairs.append(run[len(run) // 2])
+        return pairs
+
+    def set_border(self, cluster, next_cluster):
+        for a, b in self.borders.pop((cluster, next_cluster), ()):
+            self.inter_edges.get(a, set()).discard(b)
+            self.inter_edges.get(b, set()).discard(a)
+        if next_cluster[0] * CLUSTER_SIZE >= self.width or next_cluster[1] * CLUSTER_SIZE >= self.height:
+            return
+        pairs = self.get_border(cluster, next_cluster)
+        if pairs:
+            self.borders[(cluster, next_cluster)] = pairs
+        for a, b in pairs:
+            self.inter_edges.setdefault(a, set()).add(b)
+            self.inter_edges.setdefault(b, set()).add(a)
+
+    def set_entrances(self, cluster):
+        cx, cy = cluster
+        nodes = set()
+        for key, index in (((cluster, (cx + 1, cy)), 0), ((cluster, (cx, cy + 1)), 0),
+                           (((cx - 1, cy), cluster), 1), (((cx, cy - 1), cluster), 1)):
+            nodes.update(pair[index] for pair in self.borders.get(key, ()))
+        if nodes:
+            self.entrances[cluster] = nodes
+            self.intra_edges[cluster] = self.get_intra_edges(cluster)
+        else:
+            self.entrances.pop(cluster, None)
+            self.intra_edges.pop(cluster, None)
 
     def get_graph(self):
-        for y, row in enumerate(self.map):
-            for x, col in enumerate(row):
-                if not col:
-                    self.graph[(x,y)] = self.graph.get((x,y), []) + self.get_next_nodes(x,y)
+        clusters_x = (self.width + CLUSTER_SIZE - 1) // CLUSTER_SIZE
+        clusters_y = (self.height + CLUSTER_SIZE - 1) // CLUSTER_SIZE
+        for cy in range(clusters_y):
+            for cx in range(clusters_x):
+                self.set_border((cx, cy), (cx + 1, cy))
+                self.set_border((cx, cy), (cx, cy + 1))
+        for cy in range(clusters_y):
+            for cx in range(clusters_x):
+                self.set_entrances((cx, cy))
+
+    def update_tiles(self, tiles):
+        # only the borders and entrances of clusters that contain a changed tile are rebuilt
+        changed = {self.get_cluster(tile) for tile in tiles}
+        touched = set()
+        for cx, cy in changed:
+            for cluster, next_cluster in (((cx, cy), (cx + 1, cy)), ((cx, cy), (cx, cy + 1)),
+                                          ((cx - 1, cy), (cx, cy)), ((cx, cy - 1), (cx, cy))):
+                if cluster[0] >= 0 and cluster[1] >= 0:
+                    self.set_border(cluster, next_cluster)
+                    touched.update((cluster, next_cluster))
+        for cluster in touched | changed:
+            self.set_entrances(cluster)
+        self.path_cache.clear()
@@ -11,14 +11,14 @@ class Player:
         self.health = PLAYER_MAX_HEALTH
         self.rel = 0
         self.health_recovery_delay = 700
-        self.time_prev = pg.time.get_ticks()
+        self.time_prev = self.game.get_ticks()
     
     def recover_health(self):
         if self.check_health_recovery_delay() and self.health < PLAYER_MAX_HEALTH:
             self.health += 1
 
     def check_health_recovery_delay(self):
-        time_now = pg.time.get_ticks()
+        time_now = self.game.get_ticks()
         if time_now - self.time_prev > self.health_recovery_delay:
             self.time_prev = time_now
             return True
@@ -31,19 +31,25 @@ class Player:
 
     def check_game_over(self):
         if self.health <= 0:
-            self.game.object_renderer.game_over()
-            pg.display.flip()
-            self.game.sound.theme.stop()
-            pg.time.delay(1500)
-            self.game.new_game()
+            self.game.game_over()
 
 
     def single_fire_event(self,event):
         if event.type == pg.MOUSEBUTTONDOWN:
-            if event.button == 1 and not self.shot and not self.game.weapon.reloading:
-                self.game.sound.shotgun.play()
-                self.shot = True
-                self.game.weapon.reloading = True
+            if event.button == 1:
+                self.fire()
+
+    def fire(self):
+        if not self.shot and not self.game.weapon.reloading:
+            self.game.sound.shotgun.play()
+            self.game.object_handler.wake_by_sound(self.pos)
+            self.shot = True
+            self.game.weapon.reloading = True
+
+    def use(self):
+        # opens or closes the door in front of the player
+        tile = int(self.x + math.cos(self.angle)), int(self.y + math.sin(self.angle))
+        self.game.map.toggle(tile)
 
     def movement(self):
         sin_a = math.sin(self.angle)
@@ -0,0 +1,25 @@
+import time
+from contextlib import contextmanager
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.phases = {}
+        self.depth = 0
+
+    @contextmanager
+    def phase(self, name):
+        depth = self.depth
+        self.phases[name] = depth, 0.0
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            self.phases[name] = depth, (time.perf_counter() - start) * 1000
+
+    def report(self):
+        for name, (depth, ms) in self.phases.items():
+            print(f"{'  ' * depth}{name:<{24 - 2 * depth}}{ms:9.2f} ms")
+        self.phases = {}
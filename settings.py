@@ -30,4 +30,55 @@ SCREEN_DIST = HALF_WIDTH / math.tan(HALF_FOV)
 SCALE = WIDTH // NUM_RAYS
 
 TEXTURE_SIZE = 256
-HALF_TEXTURE_SIZE = TEXTURE_SIZE // 2
\ No newline at end of file
+HALF_TEXTURE_SIZE = TEXTURE_SIZE // 2
+
+SOUND_CHANNELS = 16
+SOUND_MAX_VOICES = 3
+SOUND_MAX_DIST = MAX_DEPTH
+SOUND_MIN_VOLUME = 0.05
+STEAL_OLDEST = 'oldest'
+STEAL_QUIETEST = 'quietest'
+
+PRINT_STARTUP_TIMES = False
+
+FLOOR_CASTING = False
+RENDER_SCALE = 2
+FLOOR_TEXTURE_SIZE = 256
+
+LIGHT_LEVELS = 16
+LIGHT_FALLOFF = 0.06
+LIGHT_MIN = 0.1
+FOG_COLOR = (0, 0, 0)
+DEFAULT_LIGHT = 255
+
+CLUSTER_SIZE = 10
+ENTRANCE_SPLIT = 6
+PATH_CACHE_SIZE = 1024
+
+ACTIVATION_REGION_SIZE = 8
+ACTIVATION_RADIUS = 2
+# entities closer than this to the player never sleep, the wake radii reach past it
+SLEEP_DIST = ACTIVATION_RADIUS * ACTIVATION_REGION_SIZE
+SOUND_WAKE_RADIUS = SLEEP_DIST + 8
+
+MEMORY_TRACKING = False
+MEMORY_SAMPLE_INTERVAL = 60
+MEMORY_SNAPSHOT_INTERVAL = 600
+MEMORY_REPORT_INTERVAL = 600
+MEMORY_GROWTH_WINDOW = 30
+MEMORY_GROWTH_LIMIT = 1024 * 1024
+
+ATLAS_WIDTH = 4096
+
+KERNEL_BACKEND = 'auto'  # 'auto', 'numba' or 'python'
+
+CAPTURE = False
+CAPTURE_PATH = 'captures'
+# 'png' image sequence or 'raw' stream of the native surface pixels,
+# FrameCapture prints the ffmpeg command that encodes it when it stops
+CAPTURE_FORMAT = 'png'
+CAPTURE_BUFFERS = 6
+
+MIP_MIN_SIZE = 8
+
+DOOR_WAKE_RADIUS = SLEEP_DIST + 4
@@ -0,0 +1,206 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
+from main import *
+from npc import *
+from levelgen import generate_level
+import random
+
+# Headless simulation: the world (player, objects, pathfinding, NPC combat) is stepped on a
+# virtual clock without rendering or audio, and a process pool runs many seeded sessions.
+
+SIM_FRAME_TIME = 1000 // FPS
+NPC_TYPES = SoldierNPC, CacoDemonNPC, CyberDemonNPC
+
+
+class SilentEffect:
+    def play(self, *args, **kwargs):
+        return None
+
+    def stop(self):
+        pass
+
+
+class SilentSound:
+    def __init__(self):
+        self.shotgun = self.npc_pain = self.npc_death = self.npc_shot = self.player_pain = SilentEffect()
+        self.theme = SilentEffect()
+
+
+class HeadlessRenderer:
+    def player_damage(self):
+        pass
+
+    def game_over(self):
+        pass
+
+
+class SimPlayer(Player):
+    # bot that turns towards the closest NPC it can see, shoots it and wanders otherwise,
+    # opening the doors it walks into
+    def __init__(self, game):
+        super().__init__(game)
+        self.rng = random.Random(game.seed)
+        self.damage_taken = 0
+        self.wander_angle = self.rng.uniform(0, math.tau)
+
+    def get_damage(self, damage):
+        self.damage_taken += damage
+        super().get_damage(damage)
+
+    def get_target(self):
+        visible = [npc for npc in self.game.object_handler.npc_list if npc.alive and npc.ray_cast_value]
+        return min(visible, key=lambda npc: npc.dist, default=None)
+
+    def movement(self):
+        target = self.get_target()
+        speed = PLAYER_SPEED * self.game.delta_time
+        if target:
+            angle = math.atan2(target.y - self.y, target.x - self.x)
+            delta = (angle - self.angle + math.pi) % math.tau - math.pi
+            self.angle += max(-PLAYER_ROT_SPEED, min(PLAYER_ROT_SPEED, delta)) * self.game.delta_time
+            if abs(delta) < 0.05:
+                self.fire()
+        else:
+            if self.rng.random() < 0.02:
+                self.wander_angle = self.rng.uniform(0, math.tau)
+            self.angle = self.wander_angle
+            self.check_wall_collision(speed * math.cos(self.angle), speed * math.sin(self.angle))
+            self.game.map.open((int(self.x + math.cos(self.angle)), int(self.y + math.sin(self.angle))))
+        self.angle %= math.tau
+
+    def mouse_control(self):
+        self.rel = 0
+
+
+class HeadlessGame(Game):
+    headless = True
+
+    def __init__(self, seed=0, level=None):
+        self.seed = seed
+        mini_map, doors, self.npc_positions = level or generate_level(seed=seed)
+        self.timer = PhaseTimer()
+        pg.display.init()
+        self.screen = pg.display.set_mode((1, 1))
+        self.delta_time = SIM_FRAME_TIME
+        self.global_trigger = False
+        self.ticks = 0
+        self.frame = 0
+        self.finished = False
+        self.died = False
+        self.memory_tracker = None
+        self.init_world(mini_map, doors)
+        self.new_game()
+
+    @cached_property
+    def object_renderer(self):
+        return HeadlessRenderer()
+
+    @cached_property
+    def sound(self):
+        return SilentSound()
+
+    def get_ticks(self):
+        return self.ticks
+
+    def game_over(self):
+        self.died = True
+        self.finished = True
+
+    def new_game(self):
+        random.seed(self.seed)
+        self.map.reset()
+        self.clear_paths()
+        self.player = SimPlayer(self)
+        self.object_handler = ObjectHandler(self)
+        self.weapon = Weapon(self)
+        self.spawn_npcs(random.Random(self.seed))
+
+    def spawn_npcs(self, rng):
+        for pos in self.npc_positions:
+            self.object_handler.add_npc(rng.choice(NPC_TYPES)(self, pos=pos))
+        self.start_health = {npc: npc.health for npc in self.object_handler.npc_list}
+
+    def step(self):
+        self.ticks += SIM_FRAME_TIME
+        self.global_trigger = self.ticks // 40 != (self.ticks - SIM_FRAME_TIME) // 40
+        self.player.update()
+        self.object_handler.update()
+        self.weapon.update()
+        self.frame += 1
+        if not any(npc.alive for npc in self.object_handler.npc_list):
+            self.finished = True
+
+    def run(self, max_frames):
+        while not self.finished and self.frame < max_frames:
+            self.step()
+
+    def get_results(self):
+        npcs = self.object_handler.npc_list
+        return {
+            'seed': self.seed,
+            'frames': self.frame,
+            'survival_time': self.ticks / 1000,
+            'died': self.died,
+            'damage_taken': self.player.damage_taken,
+            'damage_dealt': sum(self.start_health[npc] - max(npc.health, 0) for npc in npcs),
+            'kills': sum(not npc.alive for npc in npcs),
+        }
+
+
+def run_session(seed, max_frames, npcs, size, density):
+    start = time.perf_counter()
+    game = HeadlessGame(seed, generate_level(size, density, npcs, seed))
+    game.run(max_frames)
+    results = game.get_results()
+    results['wall_time'] = time.perf_counter() - start
+    results['fps'] = game.frame / results['wall_time']
+    results['worker'] = os.getpid()
+    return results
+
+
+def run_farm(sessions, workers=None, seed=0, max_frames=3600, npcs=8, size=32, density=0.08):
+    seeds = range(seed, seed + sessions)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_session, seeds, [max_frames] * sessions, [npcs] * sessions, [size] * sessions,
+                             [density] * sessions))
+
+
+def summarize(results, wall_time):
+    survival = [result['survival_time'] for result in results]
+    print(f'{len(results)} sessions in {wall_time:.1f} s, '
+          f'{sum(result["frames"] for result in results) / wall_time:.0f} frames/s overall')
+    print(f'survival time  mean {statistics.fmean(survival):.1f} s  min {min(survival):.1f} s  max {max(survival):.1f} s')
+    print(f'deaths {sum(result["died"] for result in results)}  '
+          f'kills/session {statistics.fmean(result["kills"] for result in results):.2f}')
+    print(f'damage taken/session {statistics.fmean(result["damage_taken"] for result in results):.1f}  '
+          f'dealt/session {statistics.fmean(result["damage_dealt"] for result in results):.1f}')
+    workers = {}
+    for result in results:
+        workers.setdefault(result['worker'], []).append(result)
+    for pid, worker_results in sorted(workers.items()):
+        frames = sum(result['frames'] for result in worker_results)
+        busy = sum(result['wall_time'] for result in worker_results)
+        print(f'  worker {pid}: {len(worker_results)} sessions, {frames / busy:.0f} frames/s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run headless game sessions in a process pool')
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--frames', type=int, default=3600)
+    parser.add_argument('--npcs', type=int, default=8)
+    parser.add_argument('--size', type=int, default=32)
+    parser.add_argument('--density', type=float, default=0.08)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_farm(args.sessions, args.workers, args.seed, args.frames, args.npcs, args.size, args.density)
+    summarize(results, time.perf_counter() - start)
@@ -1,13 +1,111 @@
 import pygame as pg
+import math
+from settings import *
+
+
+class SoundEffect:
+    def __init__(self, manager, path, max_voices=SOUND_MAX_VOICES, steal=STEAL_OLDEST):
+        self.manager = manager
+        self.sound = pg.mixer.Sound(path)
+        self.max_voices = max_voices
+        self.steal = steal
+
+    def play(self, pos=None):
+        return self.manager.play(self, pos)
+
+
+class Music:
+    # theme is streamed from disk through pg.mixer.music instead of being fully decoded
+    def __init__(self, path, volume=1.0):
+        self.path = path
+        self.volume = volume
+        self.loaded = False
+
+    def play(self, loops=-1):
+        if not self.loaded:
+            pg.mixer.music.load(self.path)
+            self.loaded = True
+        pg.mixer.music.set_volume(self.volume)
+        pg.mixer.music.play(loops)
+
+    def stop(self):
+        pg.mixer.music.stop()
+
+
+class Voice:
+    def __init__(self, effect, channel, volume):
+        self.effect = effect
+        self.channel = channel
+        self.volume = volume
+        self.start_time = pg.time.get_ticks()
+
+    @property
+    def playing(self):
+        return self.channel.get_sound() is self.effect.sound
+
 
 class Sound:
-    def __init__(self,game):
+    def __init__(self, game):
         self.game = game
         pg.mixer.init()
+        pg.mixer.set_num_channels(SOUND_CHANNELS)
+        # keep pygame's automatic channel selection away from the pool
+        pg.mixer.set_reserved(SOUND_CHANNELS)
+        self.channels = [pg.mixer.Channel(i) for i in range(SOUND_CHANNELS)]
+        self.voices = {}
         self.path = "resources/sound/"
-        self.shotgun = pg.mixer.Sound(self.path + "shotgun.wav")
-        self.npc_pain = pg.mixer.Sound(self.path + "npc_pain.wav")
-        self.npc_death = pg.mixer.Sound(self.path + "npc_death.wav")
-        self.npc_shot = pg.mixer.Sound(self.path + "npc_attack.wav")
-        self.player_pain = pg.mixer.Sound(self.path + "player_pain.wav")
-        self.theme = pg.mixer.Sound(self.path + "theme.mp3")
\ No newline at end of file
+        self.shotgun = SoundEffect(self, self.path + "shotgun.wav", max_voices=1)
+        self.npc_pain = SoundEffect(self, self.path + "npc_pain.wav", steal=STEAL_QUIETEST)
+        self.npc_death = SoundEffect(self, self.path + "npc_death.wav", steal=STEAL_QUIETEST)
+        self.npc_shot = SoundEffect(self, self.path + "npc_attack.wav", max_voices=4, steal=STEAL_QUIETEST)
+        self.player_pain = SoundEffect(self, self.path + "player_pain.wav", max_voices=1)
+        self.theme = Music(self.path + "theme.mp3")
+
+    def get_volume(self, pos):
+        if pos is None:
+            return 1.0
+        dist = math.hypot(pos[0] - self.game.player.x, pos[1] - self.game.player.y)
+        return max(0.0, 1 - dist / SOUND_MAX_DIST)
+
+    def release_finished(self):
+        for channel in [channel for channel, voice in self.voices.items() if not voice.playing]:
+            del self.voices[channel]
+
+    def get_free_channel(self):
+        for channel in self.channels:
+            if channel not in self.voices:
+                return channel
+
+    @staticmethod
+    def get_victim(voices, steal, volume):
+        if not voices:
+            return None
+        if steal == STEAL_QUIETEST:
+            victim = min(voices, key=lambda voice: voice.volume)
+            # never cut a louder sound to play a quieter one
+            return victim if victim.volume <= volume else None
+        return min(voices, key=lambda voice: voice.start_time)
+
+    def play(self, effect, pos=None):
+        volume = self.get_volume(pos)
+        if volume < SOUND_MIN_VOLUME:
+            return None
+
+        self.release_finished()
+        voices = [voice for voice in self.voices.values() if voice.effect is effect]
+        if len(voices) >= effect.max_voices:
+            victim = self.get_victim(voices, effect.steal, volume)
+            channel = victim.channel if victim else None
+        else:
+            channel = self.get_free_channel()
+            if channel is None:
+                victim = self.get_victim(list(self.voices.values()), effect.steal, volume)
+                channel = victim.channel if victim else None
+        if channel is None:
+            return None
+
+        channel.stop()
+        channel.set_volume(volume)
+        channel.play(effect.sound)
+        self.voices[channel] = Voice(effect, channel, volume)
+        return channel
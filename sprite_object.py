@@ -1,14 +1,15 @@
 import pygame as pg
 from settings import *
-import os
 from collections import deque
+from assets import load_image, load_images, get_mips
+from mipmap import get_mip_level
 
 class SpriteObject:
     def __init__(self,game,path="resources/sprites/static_sprites/tabernero.png", pos=(5,5.5), scale= 0.7, shift=0.27):
         self.game = game
         self.player = game.player
         self.x, self.y = pos
-        self.image = pg.image.load(path).convert_alpha()
+        self.image = load_image(path)
         self.IMAGE_WIDTH = self.image.get_width()
         self.IMAGE_HALF_WIDTH = self.image.get_width() // 2
         self.IMAGE_RATIO = self.IMAGE_WIDTH / self.image.get_height()
@@ -20,10 +21,18 @@ class SpriteObject:
     def get_sprite_projection(self):
         proj = SCREEN_DIST / self.norm_dist * self.SPRITE_SCALE
         proj_width, proj_height = proj * self.IMAGE_RATIO, proj
+        self.sprite_half_width = proj_width // 2
+        # a headless game only needs the projected width for hit tests
+        if self.game.headless:
+            return
 
-        image = pg.transform.scale(self.image, (int(proj_width), int(proj_height)))
+        # scale down from the smallest mip that is still as tall as the projection
+        mips = get_mips(self.image)
+        image = mips[get_mip_level(self.image.get_height(), proj_height, len(mips))]
+        level = self.game.object_renderer.lighting.get_level(self.norm_dist, self.game.map.get_light(self.map_pos))
+        image = self.game.object_renderer.lighting.get_shaded(image, level)
+        image = pg.transform.scale(image, (int(proj_width), int(proj_height)))
 
-        self.sprite_half_width = proj_width // 2
         height_shift = proj_height * self.SPRITE_HEIGHT_SHIFT
         pos = self.screen_x - self.sprite_half_width, HALF_HEIGHT - proj_height // 2 + height_shift
 
@@ -33,23 +42,17 @@ class SpriteObject:
         dx = self.x - self.player.x
         dy = self.y - self.player.y
         self.dx, self.dy = dx, dy
-        self.theta = math.atan2(dy, dx)
-
-        delta = self.theta - self.player.angle
-        if (dx > 0 and self.player.angle > math.pi) or (dx < 0 and dy < 0):
-            delta += math.tau
-
-        delta_rays = delta / DELTA_ANGLE
-        self.screen_x = (HALF_NUM_RAYS + delta_rays) * SCALE
-
-        self.dist = math.hypot(dx, dy)
-        self.norm_dist = self.dist * math.cos(delta)
+        self.theta, self.screen_x, self.dist, self.norm_dist = self.game.kernels.project_sprite(dx, dy, self.player.angle)
         if -self.IMAGE_HALF_WIDTH < self.screen_x < (WIDTH + self.IMAGE_HALF_WIDTH) and self.norm_dist > 0.5:
             self.get_sprite_projection()
 
     def update(self):
         self.get_sprite()
 
+    @property
+    def map_pos(self):
+        return int(self.x), int(self.y)
+
 
 class AnimatedSprite(SpriteObject):
     def __init__(self, game, path="resources/sprites/animated_sprites/green_light/0.png", pos=(7.5, 5.5), scale=0.8, shift=0.15, animation_time = 120):
@@ -57,7 +60,7 @@ class AnimatedSprite(SpriteObject):
         self.animation_time = animation_time
         self.path = path.rsplit("/",1)[0]
         self.images = self.get_images(self.path)
-        self.animation_time_prev = pg.time.get_ticks()
+        self.animation_time_prev = self.game.get_ticks()
         self.animation_trigger = False
 
     def update(self):
@@ -72,17 +75,12 @@ class AnimatedSprite(SpriteObject):
 
     def check_animaton_time(self):
         self.animation_trigger = False
-        time_now = pg.time.get_ticks()
+        time_now = self.game.get_ticks()
         if time_now - self.animation_time_prev > self.animation_time:
             self.animation_time_prev = time_now
             self.animation_trigger = True
 
     def get_images(self,path):
-        images = deque()
-        for file_name in os.listdir(path):
-            if os.path.isfile(os.path.join(path,file_name)):
-                img = pg.image.load(path + "/" + file_name).convert_alpha()
-                images.append(img)
-        return images
+        return deque(load_images(path))
 
 
@@ -1,18 +1,20 @@
 from sprite_object import *
+from assets import load_scaled_images
 
 
 class Weapon(AnimatedSprite):
     def __init__(self, game, path="resources/sprites/weapon/shotgun/0.png",scale=0.4, animation_time = 90):
         super().__init__(game=game, path=path, scale=scale, animation_time=animation_time)
-        self.images = deque(
-            [pg.transform.smoothscale(img, (int(self.image.get_width() * scale), int(self.image.get_height() * scale))) for img in self.images]
-        )
         self.weapon_pos = (HALF_WIDTH - self.images[0].get_width() // 2, HEIGHT - self.images[0].get_height())
         self.reloading = False
         self.num_images = len(self.images)
         self.frame_counter = 0
         self.damage = 50
 
+    def get_images(self, path):
+        size = int(self.image.get_width() * self.SPRITE_SCALE), int(self.image.get_height() * self.SPRITE_SCALE)
+        return deque(load_scaled_images(path, size))
+
     def animate_shot(self):
         if self.reloading:
             self.game.player.shot = False
@@ -25,7 +27,7 @@ class Weapon(AnimatedSprite):
                     self.frame_counter = 0
 
     def draw(self):
-        self.game.screen.blit(self.images[0], self.weapon_pos)
+        self.game.object_renderer.draw_queue.add(self.images[0], self.weapon_pos)
 
     def update(self):
         self.check_animaton_time()